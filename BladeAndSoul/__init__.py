@@ -1 +1,3 @@
-from .bns import get_character as character, Character, avg_dmg
+from .bns import get_character as character, get_characters as characters, iter_characters, find_character, Character, avg_dmg
+from .client import Client, close
+from .cache import LRUCache, SQLiteCache
@@ -0,0 +1,40 @@
+"""
+Export characters or market items for a list of names, one name a line.
+
+    python -m BladeAndSoul characters names.txt -o characters.jsonl --checkpoint characters.ckpt
+    cat items.txt | python -m BladeAndSoul items --display 3 --format parquet -o items/
+
+Run the same command again with the same --checkpoint to resume an interrupted export.
+"""
+import argparse
+import sys
+
+from . import export, sync
+
+
+def main(argv=None):
+    args = argparse.ArgumentParser(prog='python -m BladeAndSoul', description=__doc__,
+                                   formatter_class=argparse.RawDescriptionHelpFormatter)
+    args.add_argument('kind', choices=export.KINDS, help='what to look the names up as')
+    args.add_argument('input', nargs='?', default='-', help='the file of names, stdin if - or not given')
+    args.add_argument('-o', '--output', default='-', help='the jsonl file (stdout if -) or parquet directory')
+    args.add_argument('-f', '--format', choices=export.FORMATS, default='jsonl')
+    args.add_argument('-c', '--concurrency', type=int, default=10, help='names fetched at once')
+    args.add_argument('--region', help='NA or EU')
+    args.add_argument('--display', type=int, default=1, help='matching items looked up per name (items only)')
+    args.add_argument('--checkpoint', help='a file progress is saved to, and resumed from if it exists')
+    args.add_argument('--batch', type=int, default=1000, help='results between checkpoints, rows per parquet file')
+    args = args.parse_args(argv)
+    names = sys.stdin if args.input == '-' else open(args.input, encoding='utf-8')
+    try:
+        fetched = sync.export(names, args.output, kind=args.kind, format=args.format, concurrency=args.concurrency,
+                              region=args.region, display=args.display, checkpoint=args.checkpoint,
+                              batch=args.batch)
+    finally:
+        if names is not sys.stdin:
+            names.close()
+    print('fetched', fetched, args.kind, file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
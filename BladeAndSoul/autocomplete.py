@@ -0,0 +1,120 @@
+"""
+Character name autocomplete on top of the search box suggestions (bns.suggest_users).
+
+Every name the service suggests goes into a local sorted index. A prefix is answered from the
+index when an earlier answer is known to have held every name starting with it (the service
+returned fewer than display names for a shorter prefix), so after a few keystrokes most lookups
+never leave the process. Other prefixes wait debounce seconds, and are dropped in favour of the
+newer prefix if the same session types again meanwhile.
+
+    names = Autocomplete(client)
+    await names.suggest('Yu', session=user_id)
+"""
+import asyncio
+from bisect import bisect_left, insort
+
+from .bns import suggest_users
+from .client import Client, default_client
+
+
+class NameIndex(object):
+    """Names kept sorted by their lower case spelling, for prefix lookups"""
+    def __init__(self, names=()):
+        self.keys = []
+        self.names = {}
+        self.add(names)
+
+    def add(self, names):
+        for name in names:
+            key = name.lower()
+            if key not in self.names:
+                insort(self.keys, key)
+            self.names[key] = name
+
+    def prefix(self, prefix, limit: int=None) -> list:
+        """The names starting with prefix (not case sensitive), alphabetically"""
+        prefix = prefix.lower()
+        r = []
+        for i in range(bisect_left(self.keys, prefix), len(self.keys)):
+            if not self.keys[i].startswith(prefix) or len(r) == limit:
+                break
+            r.append(self.names[self.keys[i]])
+        return r
+
+    def __contains__(self, name):
+        return name.lower() in self.names
+
+    def __len__(self):
+        return len(self.keys)
+
+
+class Autocomplete(object):
+    """
+    :param client: The Client to fetch with, the shared default client is used if not given.
+    :param region: The region to suggest names from, the client's region if not given.
+    :param display: The number of names asked for and returned.
+    :param debounce: Seconds a prefix that needs the network waits for the next keystroke.
+    """
+    def __init__(self, client: Client=None, region: str=None, display: int=10, debounce: float=0.15):
+        self.client = client
+        self.region = region
+        self.display = display
+        self.debounce = debounce
+        self.index = NameIndex()
+        # prefixes the service answered with every matching name
+        self.complete = set()
+        # the service's answer for prefixes it had more names for than display
+        self.answers = {}
+        self.local = self.remote = 0
+        self._latest = {}
+        self._pending = {}
+
+    def lookup(self, prefix):
+        """The names for prefix from the index, None if the index might be missing some"""
+        key = prefix.lower()
+        if key in self.answers:
+            return self.answers[key]
+        if any(key[:i] in self.complete for i in range(len(key) + 1)):
+            return self.index.prefix(key, self.display)
+        return None
+
+    async def _fetch(self, key):
+        names = await suggest_users(key, self.display, client=self.client or default_client(), region=self.region)
+        self.index.add(names)
+        if len(names) < self.display:
+            self.complete.add(key)
+        else:
+            self.answers[key] = names
+        return names
+
+    async def suggest(self, prefix, session=None) -> list:
+        """
+        Names starting with prefix
+
+        :param session: Whoever is typing (e.g. a user id). A lookup that is still waiting when the
+            same session asks for another prefix returns what the index has instead.
+            Lookups without a session are debounced but never replaced.
+        """
+        found = self.lookup(prefix)
+        if found is not None:
+            self.local += 1
+            return found
+        key = prefix.lower()
+        if key not in self._pending:
+            if session is None:
+                await asyncio.sleep(self.debounce)
+            else:
+                token = self._latest[session] = object()
+                await asyncio.sleep(self.debounce)
+                if self._latest.get(session) is not token:
+                    return self.index.prefix(key, self.display)
+                del self._latest[session]
+            found = self.lookup(prefix)
+            if found is not None:
+                self.local += 1
+                return found
+            if key not in self._pending:
+                self.remote += 1
+                self._pending[key] = asyncio.ensure_future(self._fetch(key))
+                self._pending[key].add_done_callback(lambda _: self._pending.pop(key, None))
+        return list(await asyncio.shield(self._pending[key]))
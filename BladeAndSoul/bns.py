@@ -1,9 +1,15 @@
 import asyncio
 import json
+import re
+import time
+from array import array
 
-import aiohttp
 from bs4 import BeautifulSoup
 
+from . import metrics, render
+from .client import Client, default_client
+from .items import decode_jsonp
+from .models import Gear, LazyStats, Outfit, Stats
 from .errors import (CharacterNotFound, FailedToParse, InvalidData,
                      ServiceUnavialable)
 
@@ -13,6 +19,10 @@ try:
 except ImportError:
     parser = 'html.parser'
 
+# How pages are parsed, 'soup' walks a BeautifulSoup tree built with parser,
+# 'lxml' runs XPath expressions compiled at import time (see fastparse.py).
+engine = 'soup'
+
 
 # types of weapons in game
 VALID_WEAPONS = ['dagger', 'sword', 'staff', 'razor', 'axe', 'bangle', 'gauntlet', 'lynblade', 'bracer']
@@ -24,6 +34,18 @@ SUGGEST_URL = 'http://na-search.ncsoft.com/openapi/suggest.jsp'  # ?site=bns&dis
 MARKET_API_ENDPOINT = 'http://na.bnsbazaar.com/api/market' # ITEM NAME
 ITEM_NAME_SUGGEST = 'http://na-search.ncsoft.com/openapi/bnsmarketsuggest.jsp' #?site=bns&display=1&collection=bnsitemsuggest&lang=en&callback=suggestKeyword&query=items
 BASE_ITEM_IMAGE_URL = 'http://static.ncsoft.com/bns_resource/ui_resource'
+# the endpoints of every region, requests read them from here (the globals above are NA's)
+REGIONS = {'NA': {'PROFILE_URL': PROFILE_URL, 'SEARCH_URL': SEARCH_URL, 'SUGGEST_URL': SUGGEST_URL,
+                  'MARKET_API_ENDPOINT': MARKET_API_ENDPOINT, 'ITEM_NAME_SUGGEST': ITEM_NAME_SUGGEST},
+           'EU': {'PROFILE_URL': 'http://eu-bns.ncsoft.com/ingame/bs/character/profile',
+                  'SEARCH_URL': 'http://eu-bns.ncsoft.com/ingame/bs/character/search/info',
+                  'SUGGEST_URL': 'http://eu-search.ncsoft.com/openapi/suggest.jsp',
+                  'MARKET_API_ENDPOINT': 'http://eu.bnsbazaar.com/api/market',
+                  'ITEM_NAME_SUGGEST': 'http://eu-search.ncsoft.com/openapi/bnsmarketsuggest.jsp'}}
+# value of each coin in copper
+COIN_VALUES = {'gold': 10000, 'silver': 100, 'bronze': 1}
+# matches a listing separator or the amount in a coin's span
+PRICE_PATTERN = re.compile(r'(\0)|<span[^>]*class=["\']?[^"\'>]*\b(gold|silver|bronze)\b[^>]*>\s*([\d,]+)')
 
 
 
@@ -81,24 +103,102 @@ def set_bonus(set_) -> tuple:
     return (':\n'.join(('\n'.join((t.strip() for t in z.text.strip().split('\n') if t.strip() != '')) for z in x)) for x
             in dict(zip(set_.find_all('p', class_='discription'), set_.find_all('p', class_='setEffect'))).items())
 
-async def fetch_url(url, params={}):
+async def fetch_url(url, params={}, client: Client=None):
     """
     Fetch a url and return soup
+
+    :param client: The Client to fetch with, the shared default client is used if not given
     """
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url, params=params) as re:
-            return BeautifulSoup(await re.text(), parser)
+    client = client or default_client()
+    return await client.scheduled('url', lambda: _fetch_url(url, params, client))
 
-async def search_user(user, suggest=True, max_count=3) -> list:
-    soup = await fetch_url(SEARCH_URL, params={'c': user})
+async def _fetch_url(url, params, client):
+    return BeautifulSoup(await client.get_text(url, params=params), parser)
+
+def parse_search(html) -> list:
+    """
+    Parse a search page into a list of (character name, other characters) for every match
+    """
+    timed = metrics.sink is not None
+    if timed:
+        start = time.perf_counter()
+    soup = BeautifulSoup(html, parser)
+    if timed:
+        metrics.timing('parse.tree', start, parser='soup')
+        start = time.perf_counter()
     search = soup.find('div', class_='searchList')
+    if search is None and soup.find('div', class_='pCharacter error', id='container') is not None:
+        raise ServiceUnavialable('Cannot Access BNS At this time')
+    r = [(x.dl.dt.a.text, [b.text for b in x.dl.find('dd', class_='other').dd.find_all('li')]) for x in
+         search.find_all('li') if x.dt is not None]
+    if timed:
+        metrics.timing('parse.extract', start, parser='soup')
+    return r
+
+def _region(region, client: Client) -> str:
+    """The region to use, the client's if region is None"""
+    region = (region or client.region).upper()
+    if region not in REGIONS:
+        raise ValueError('Unknown region "{}", expected one of {}'.format(region, ', '.join(REGIONS)))
+    return region
+
+def _engine():
+    """Return (parse_search, parse_profile, parse_stats) for the selected engine"""
+    if engine == 'lxml':
+        from . import fastparse
+        return fastparse.parse_search, fastparse.parse_profile, fastparse.parse_stats
+    if engine == 'soup':
+        return parse_search, parse_profile, parse_stats
+    raise ValueError('Unknown parse engine "{}"'.format(engine))
+
+async def _search_user(user, client, region):
+    async def search():
+        html = await client.get_text(REGIONS[region]['SEARCH_URL'], params={'c': user}, endpoint='search')
+        return await client.parse_page(_engine()[0], html)
+    return await client.scheduled('search', search)
+
+async def search_user(user, suggest=True, max_count=3, client: Client=None, region: str=None) -> list:
+    """
+    Search for a character
+
+    :param suggest: Return up to max_count (name, other characters) matches, otherwise only the first match
+    :param client: The Client to fetch with, the shared default client is used if not given
+    :param region: The region to search ('NA', 'EU'), the client's region if not given
+    """
+    client = client or default_client()
+    region = _region(region, client)
+    results = await client.cached('search:{}:{}'.format(region, user.lower()), lambda: _search_user(user, client, region))
     if suggest:
-        return [(x.dl.dt.a.text, [b.text for b in x.dl.find('dd', class_='other').dd.find_all('li')]) for x in
-                search.find_all('li') if x.dt is not None][:max_count]
-    return (search.li.dl.dt.a.text,
-            [x.text for x in search.li.dl.find('dd', class_='other').dd.find_all('li') if x is not None])
+        return results[:max_count]
+    if not results:
+        raise CharacterNotFound('Failed to find character "{}"'.format(user))
+    return results[0]
+
+async def _suggest_users(prefix, display, client, region):
+    text = await client.get_text(REGIONS[region]['SUGGEST_URL'], endpoint='suggest',
+                                 params={'site': 'bns', 'display': display, 'collection': 'bnsusersuggest', 'query': prefix})
+    try:
+        data = json.loads(text)
+    except ValueError:
+        raise ServiceUnavialable('Name suggestions returned invalid data')
+    if data.get('result') != '0':
+        raise ServiceUnavialable('Name suggestions failed')
+    return [x[0] for x in data['front'] if len(x) == 2 and isinstance(x[0], str)]
+
+async def suggest_users(prefix, display: int=10, client: Client=None, region: str=None) -> list:
+    """
+    Character names starting with prefix, as suggested by the search box
 
-async def fetch_profile(user) -> dict:
+    :param display: The maximum number of names
+    :param client: The Client to fetch with, the shared default client is used if not given
+    :param region: The region to look in, the client's region if not given
+    """
+    client = client or default_client()
+    region = _region(region, client)
+    return await client.cached('suggest:{}:{}:{}'.format(region, display, prefix.lower()),
+                               lambda: client.scheduled('suggest', lambda: _suggest_users(prefix, display, client, region)))
+
+async def fetch_profile(user, client: Client=None, lazy: bool=False, region: str=None, cached: bool=True) -> dict:
     """
     Fetches a user and returns the data as a dict
 
@@ -119,35 +219,27 @@ async def fetch_profile(user) -> dict:
     Region - The region the user is from.
 
     :parm user: The name of the character you wish to fetch data for
+    :param client: The Client to fetch with, the shared default client is used if not given
+    :param lazy: Only parse Stats when they are first used (Stats is then a models.LazyStats)
+    :param region: The region the character is in ('NA', 'EU'), the client's region if not given
+    :param cached: Fetch the profile even when the client's cache has it (the cache is left as it is)
     """
-    CharacterName, other_chars = await search_user(user, suggest=False)
-    soup = await fetch_url(PROFILE_URL, params={'c': CharacterName})
-    if len(soup.find_all('div', clas_='pCharacter error', id='container')):
-        raise ServiceUnavialable('Cannot Access BNS At this time')
-    # INFORMATION
-    Name = soup.find('a', href='#').text
-    CharacterName = soup.find('dt').span.text[1:-1]
-    Class, Level, Server, *Faction = [x.text.strip().replace('\xa0', ' ') for x in
-                                      soup.find('dd', class_='desc').find_all('li')]
-    if len(Faction) == 0:
-        Clan = Rank = Faction = None
-    elif len(Faction) == 1:
-        Faction = Faction[0].split()
-        Rank = ' '.join(Faction[2:])
-        Faction = ' '.join(Faction[:2])
-        Clan = None
-    else:
-        Clan = Faction[1]
-        Faction = Faction[0].split()
-        Rank = ' '.join(Faction[2:])
-        Faction = ' '.join(Faction[:2])
-    Level = Level.split()
-    if len(Level) > 2:
-        HM = int(Level[-1])
-    else:
-        HM = 0
-    Level = int(Level[1])
-
+    client = client or default_client()
+    region = _region(region, client)
+    if not cached:
+        return await _fetch_profile(user, client, lazy, region)
+    key = 'profile:{}:{}{}'.format(region, 'lazy:' if lazy else '', user.lower())
+    return await client.cached(key, lambda: _fetch_profile(user, client, lazy, region))
+
+async def _fetch_profile(user, client, lazy, region) -> dict:
+    CharacterName, other_chars = await search_user(user, suggest=False, client=client, region=region)
+
+    async def profile():
+        html = await client.get_text(REGIONS[region]['PROFILE_URL'], params={'c': CharacterName}, endpoint='profile')
+        return await client.parse_page(_engine()[1], html, other_chars, lazy, region)
+    return await client.scheduled('profile', profile)
+
+def _parse_stats(soup) -> dict:
     # ATTACK
     ATK = soup.find('div', class_='attack').dl
     sub = [z for z in (dict(zip((z.text for z in x.find_all('span', class_='title')),
@@ -180,6 +272,58 @@ async def fetch_profile(user) -> dict:
     Defense['Health Regen'].update(sub[7])
     Defense['Recovery'].update(sub[8])
 
+    ATK.update(Defense)
+    return ATK
+
+def parse_stats(html) -> dict:
+    """
+    Parse the Stats of a profile page
+    """
+    return _parse_stats(BeautifulSoup(html, parser))
+
+def parse_profile(html, other_chars: list, lazy: bool=False, region: str='NA') -> dict:
+    """
+    Parse a profile page into the dict described in fetch_profile
+
+    :param other_chars: The other characters on the account, taken from the search page
+    :param lazy: Keep the page (compressed) and only parse Stats when they are first used, see models.LazyStats
+    :param region: The region the page is from
+    """
+    timed = metrics.sink is not None
+    if timed:
+        start = time.perf_counter()
+    soup = BeautifulSoup(html, parser)
+    if timed:
+        metrics.timing('parse.tree', start, parser='soup')
+        start = time.perf_counter()
+    if len(soup.find_all('div', class_='pCharacter error', id='container')):
+        raise ServiceUnavialable('Cannot Access BNS At this time')
+    # INFORMATION
+    Name = soup.find('a', href='#').text
+    CharacterName = soup.find('dt').span.text[1:-1]
+    Class, Level, Server, *Faction = [x.text.strip().replace('\xa0', ' ') for x in
+                                      soup.find('dd', class_='desc').find_all('li')]
+    if len(Faction) == 0:
+        Clan = Rank = Faction = None
+    elif len(Faction) == 1:
+        Faction = Faction[0].split()
+        Rank = ' '.join(Faction[2:])
+        Faction = ' '.join(Faction[:2])
+        Clan = None
+    else:
+        Clan = Faction[1]
+        Faction = Faction[0].split()
+        Rank = ' '.join(Faction[2:])
+        Faction = ' '.join(Faction[:2])
+    Level = Level.split()
+    if len(Level) > 2:
+        HM = int(Level[-1])
+    else:
+        HM = 0
+    Level = int(Level[1])
+
+    Stats = LazyStats(html, parse_stats) if lazy else _parse_stats(soup)
+
     # GEAR
     Weapon = get_name(soup.find('div', class_='wrapWeapon'))
     Necklace = get_name(soup.find('div', class_='wrapAccessory necklace'))
@@ -192,10 +336,10 @@ async def fetch_profile(user) -> dict:
     # SoulSheild
     SS = soup.find('div', class_='wrapGem')
     BONUS = ()
-    Stats = ()
+    Shield = ()
     if any(x.img is not None for x in SS.find_all('span')):
         BONUS = set_bonus(SS.find('div', class_='lyCharmEffect'))
-        Stats = ([': '.join([tr.th.text, tr.td.text]) for tr in SS.table.find_all('tr')])
+        Shield = ([': '.join([tr.th.text, tr.td.text]) for tr in SS.table.find_all('tr')])
     # OUTFIT
     Clothes = get_name(soup.find('div', class_='wrapAccessory clothes'))
     Head = get_name(soup.find('div', class_='wrapAccessory tire'))
@@ -204,7 +348,7 @@ async def fetch_profile(user) -> dict:
 
     # PROFILEPICTURE
     Picture = soup.find('section').div.div.img.get('src')
-    del soup, temp, sub
+    del soup
     r = {'Account Name': Name,
             'Character Name': CharacterName,
             'Class': Class,
@@ -215,7 +359,7 @@ async def fetch_profile(user) -> dict:
             'Clan': Clan,
             'Faction Rank': Rank,
             'Picture': Picture,
-            'Stats': {},
+            'Stats': Stats,
             'Gear': {
                 'Weapon': Weapon,
                 'Necklace': Necklace,
@@ -224,46 +368,113 @@ async def fetch_profile(user) -> dict:
                 'Bracelet': Bracelet,
                 'Belt': Belt,
                 'Soul': Soul},
-            'SoulSheild': Stats,
+            'SoulSheild': Shield,
             'Set Bonus': '\n\n'.join(BONUS),
             'Outfit': {'Clothes': Clothes,
                        'Head': Head,
                        'Face': Face,
                        'Adornment': Adornment},
             'Other Characters': other_chars,
-            'Region': 'NA'}
-    r['Stats'].update(ATK)
-    r['Stats'].update(Defense)
+            'Region': region}
+    if timed:
+        metrics.timing('parse.extract', start, parser='soup')
     return r
 
 
-async def get_item_name_suggestions(item, display, session):
-    async with session.get(ITEM_NAME_SUGGEST, params={'site': 'bns', 'display': display, 'collection': 'bnsitemsuggest', 'callback': 'suggestKeyword', 'query': item}) as re:
-        data: dict = json.loads((await re.text())[17:-4])
-    if data['result'] != "0":
+async def get_item_name_suggestions(item, display, client: Client, region: str=None):
+    region = _region(region, client)
+    return await client.scheduled('item_suggest', lambda: _get_item_name_suggestions(item, display, client, region))
+
+async def _get_item_name_suggestions(item, display, client: Client, region):
+    text = await client.get_text(REGIONS[region]['ITEM_NAME_SUGGEST'], params={'site': 'bns', 'display': display, 'collection': 'bnsitemsuggest', 'callback': 'suggestKeyword', 'query': item}, endpoint='item_suggest')
+    try:
+        data: dict = decode_jsonp(text)
+    except ValueError:
+        raise ServiceUnavialable('Item suggestions returned invalid data')
+    if not isinstance(data, dict) or data.get('result') != "0":
         raise ServiceUnavialable
     return data
 
 
-async def search_item(item, display:int=1):
-    def price_parse(html):
-        soup = BeautifulSoup(html, parser)
-        return [int(x.text.split()[0]) if x is not 0 else 0 for x in [soup.find(name='span', attrs={'class':c}) or 0 for c in ('gold', 'silver', 'bronze')]]
+def price_parse(htmls) -> list:
+    """
+    Read the gold/silver/bronze spans of many listings' price_html in one pass.
+    Returns each price as a single number of copper (bronze).
+    """
+    prices = [0]
+    for gap, coin, amount in PRICE_PATTERN.findall('\0'.join(htmls)):
+        if gap:
+            prices.append(0)
+        else:
+            prices[-1] += int(amount.replace(',', '')) * COIN_VALUES[coin]
+    return prices if htmls else []
+
+def split_price(copper: int) -> tuple:
+    """Split a price in copper into (gold, silver, bronze)"""
+    return copper // 10000, copper // 100 % 100, copper % 100
+
+def parse_market(text, titem, compact: bool=False) -> dict:
+    """
+    Parse a market api response into {'icon', 'prices', 'name'}
+    prices is a list of (price in copper, amount) for every listing.
+
+    :param compact: Return prices and amounts as two array('q') instead, for large listing sets
+    """
+    try:
+        data = json.loads(text)
+    except ValueError:
+        raise InvalidData("Market Returned Invalid Data")
+    if (not isinstance(data, list)) or len(data) == 0:
+        raise InvalidData("Market Returned Invalid Data")
+    prices = price_parse([e['price_html'] for e in data])
+    amounts = [int(e['sale_data']['amount']) for e in data]
+    r = {'icon': ''.join([BASE_ITEM_IMAGE_URL, data[0]['iconImg']]), 'name': titem}
+    if compact:
+        r['prices'] = array('q', prices)
+        r['amounts'] = array('q', amounts)
+    else:
+        r['prices'] = list(zip(prices, amounts))
+    return r
 
-    async def get_item_data(titem, session):
-        async with session.get(f'{MARKET_API_ENDPOINT}/{titem}/true') as re:
-            data = await re.json()
-        if (not isinstance(data, list)) or len(data) == 0:
-            raise InvalidData("Market Returned Invalid Data")
-        return {'icon': ''.join([BASE_ITEM_IMAGE_URL, data[0]['iconImg']]),
-                'prices': [(price_parse(e['price_html']), int(e['sale_data']['amount'])) for e in data],
-                'name': titem}
+async def get_item_data(titem, client: Client, compact: bool=False, region: str=None):
+    region = _region(region, client)
 
+    async def market():
+        text = await client.get_text('{}/{}/true'.format(REGIONS[region]['MARKET_API_ENDPOINT'], titem), endpoint='market')
+        return await client.parse(parse_market, text, titem, compact)
+    return await client.scheduled('market', market)
 
-    with aiohttp.ClientSession() as session:
-        data = await get_item_name_suggestions(item, display, session)
-        suggestions = [x[0] for x in data["front"] if len(x) == 2 and x[1] == 0 and isinstance(x[0], str)]
-        return [await get_item_data(item, session) for item in suggestions]
+async def search_item(item, display:int=1, client: Client=None, concurrency: int=5, compact: bool=False,
+                      region: str=None):
+    """
+    Search the market
+
+    :param display: The number of matching items to look up
+    :param client: The Client to fetch with, the shared default client is used if not given
+    :param concurrency: The maximum number of market requests made at once
+    :param compact: See parse_market
+    :param region: The region's market ('NA', 'EU'), the client's region if not given
+    :return: A list of {'icon', 'prices', 'name'} (see parse_market), one for each matching item
+    """
+    async def fetch(name):
+        async with semaphore:
+            return await get_item_data(name, client, compact, region)
+
+    async def search():
+        names = client.item_index.names(region, item, display)
+        if names is None:
+            data = await get_item_name_suggestions(item, display, client, region)
+            names = [x[0] for x in data["front"] if len(x) == 2 and x[1] == 0 and isinstance(x[0], str)]
+            client.item_index.set_names(region, item, display, names)
+        items = list(await asyncio.gather(*map(fetch, names)))
+        client.item_index.set_items(region, [(x['name'], x['icon']) for x in items])
+        return items
+
+    client = client or default_client()
+    region = _region(region, client)
+    semaphore = asyncio.Semaphore(concurrency)
+    key = 'item:{}:{}:{}{}'.format(region, display, item.lower(), ':compact' if compact else '')
+    return await client.cached(key, search)
 
 class Character(object):
     """
@@ -274,7 +485,8 @@ class Character(object):
     pretty_stats - Return a prettied Stats Overview as a string.
     pretty_outfit - Return a prettied Outfit Overview as a string.
     Notice: The Following items can be used as self.item with space replaced with "_" and it is not case sensitive.
-    Notice: The Following items can also be used as self[item] it is case sensitive, no replacement.
+    Notice: The Following items can also be used as self[item].
+    Stats, Gear and Outfit are read only mappings (see models.py), their values are kept compactly.
     Account Name - The display name for their account (str).
     Character Name - The Name of the given character (str).
     Level - Character's level (str).
@@ -282,125 +494,102 @@ class Character(object):
     Server - Server the character is on (str).
     Faction - The Faction the character is in (str).
     Picture - Link to the character's profile picture (str).
-    Stats - A dictionary object with stats (each stat is also a dict).
-    Gear - The gear of the Given Character (list).
+    Stats - A mapping of stats (each stat is also a mapping, stat.value(key) gives numbers).
+    Gear - The gear of the Given Character (mapping).
     SoulSheild - SoulSheild stats (str).
     Set Bonus - Set bonus affects, a list of strings (list).
-    Outfit - The outfit of the character (dict).
+    Outfit - The outfit of the character (mapping).
     Other Characters - A list of the other characters on that user's account (list).
     Region - The region the user is from.
     """
-    def __init__(self, data: dict):
-        data = data.copy()
-        self.name = data['Character Name']
-        self.__data = data
-        self.items = self.__data.items
-        self.keys = self.__data.keys
-        self.account = data['Account Name']
+    # (key, slot) for every field
+    FIELDS = (('Account Name', 'account'), ('Character Name', 'name'), ('Class', 'class_'), ('Level', 'level'),
+              ('HM Level', 'hm_level'), ('Server', 'server'), ('Faction', 'faction'), ('Clan', 'clan'),
+              ('Faction Rank', 'faction_rank'), ('Picture', 'picture'), ('Stats', 'stats'), ('Gear', 'gear'),
+              ('SoulSheild', 'soul_shield'), ('Set Bonus', 'set_bonus'), ('Outfit', 'outfit'),
+              ('Other Characters', 'other_characters'), ('Region', 'region'))
+    __slots__ = tuple(slot for _, slot in FIELDS if slot != 'stats') + ('_stats', '_rendered', 'client', 'lazy')
+    # every accepted spelling of a key (any case, "_" or " ") to its slot, built once
+    _KEYS = {spelling: slot for key, slot in FIELDS for spelling in (key.lower(), key.lower().replace(' ', '_'))}
+
+    def __init__(self, data: dict, client: Client=None, lazy: bool=False):
+        self.client = client
+        self.lazy = lazy
+        self._load(data)
+
+    def _load(self, data: dict):
+        # cards rendered from the old data (see render.py)
+        self._rendered = {}
+        for key, slot in self.FIELDS:
+            setattr(self, slot, data.get(key))
+        self.gear = Gear(self.gear)
+        self.outfit = Outfit(self.outfit)
+
+    @property
+    def stats(self) -> Stats:
+        if isinstance(self._stats, LazyStats):
+            self._stats = self._stats.load()
+        return self._stats
+
+    @stats.setter
+    def stats(self, value):
+        self._stats = value if isinstance(value, (Stats, LazyStats)) else Stats(value)
 
     async def refresh(self):
-        self.__data = await fetch_profile(self.name)
-        self.items = self.__data.items
-        self.keys = self.__data.keys
+        self._load(await fetch_profile(self.name, client=self.client, lazy=self.lazy, region=self.region))
 
     def __call__(self):
         """returns an awaitable to refresh"""
         return self.refresh()
 
+    def keys(self):
+        return [key for key, _ in self.FIELDS]
 
-    def __getattr__(self, item):
-        return self[str(item)]
+    def items(self):
+        return [(key, getattr(self, slot)) for key, slot in self.FIELDS]
 
-    def __getitem__(self, item):
-        item = str(item).replace('_', ' ')
-        k = list(self.__data.keys())
-        k = dict(zip([z.lower() for z in k], k))
+    def to_dict(self) -> dict:
+        """The character as the plain dict fetch_profile returns"""
+        r = dict(self.items())
+        r['Stats'] = {k: dict(v) for k, v in self.stats.items()}
+        r['Gear'] = dict(self.gear)
+        r['Outfit'] = dict(self.outfit)
+        return r
+
+    def __getattr__(self, item):
+        if item.startswith('__'):
+            raise AttributeError(item)
         try:
-            return self.__data[k.get(item.lower())]
+            return self[item]
         except KeyError:
-            return self.__data[k.get(item.lower().replace(' ', '_'))]
+            raise AttributeError(item)
+
+    def __getitem__(self, item):
+        item = str(item).lower()
+        slot = self._KEYS.get(item) or self._KEYS.get(item.replace('_', ' '))
+        if slot is None:
+            raise KeyError(item)
+        return getattr(self, slot)
 
+    @metrics.timed('render', renderer='pretty_profile')
     def pretty_profile(self):
         """Return A prettyfied profile Overview as a string"""
-        if self['HM Level']:
-            temp = 'Level {} Hongmoon Level {}'.format(self['Level'], self['HM Level'])
-        else:
-            temp = 'Level {}'.format(self['Level'])
-        text = ['**Display Name:** {}'.format(self['Account Name']),
-                '**Character**: {} {}'.format(self['Character Name'], temp),
-                '**Weapon**: {}'.format(self['Gear']['Weapon']),
-                '**Server:** {}'.format(self['Server'])]
-        if self['Faction']:
-            if self['Faction'] == 'Cerulean Order':
-                text.append('**Faction:** Cerulean Order :blue_heart:')
-            else:
-                text.append('**Faction"** Crimson Legion :heart:')
-            text.append('**Faction Rank:** {}'.format(self['Faction Rank']))
-            if self['Clan']:
-                text.append('**Clan:** {}'.format(self['Clan']))
-        if len(self['Other Characters']):
-            temp = ['[', ']']
-            temp.insert(1, ', '.join(self['Other Characters']))
-            text.append('**Other Characters:**\n {}'.format(''.join(temp)))
-        text.append(self['Picture'])
-        return '\n'.join(text).strip()
+        return render.card(self, 'profile')
 
+    @metrics.timed('render', renderer='pretty_gear')
     def pretty_gear(self):
         """Return a prettyfied Gear Overview as a string"""
-        temp = [self['Character Name'], '[' + self['Class'],'Level', str(self['Level'])]
-        if self['HM Level']:
-            temp += ['Hongmoon Level', str(self['HM Level'])]
-        temp = ' '.join(temp) + ']'
-        divider = '─'*len(temp)
-        stats = self['Stats']
-        send_this = ['```', temp, divider, 'Total HP {}    Attack Power {}'.format(stats['HP']['Total'], stats['Attack Power']['Total']),
-                     divider, 'Soul Shield Attributes (Base + Fused + Set)', '\n'.join(self['SoulSheild']),
-                     ''.join(self['Set Bonus']), '']
-        gear = self['Gear']
-        temp = list(gear.keys())
-        temp.sort()
-        for k in temp:
-            send_this.append('{}: {}'.format(k, gear[k]))
-        send_this.append(divider)
-        send_this.append('```')
-        return '\n'.join(send_this).strip()
+        return render.card(self, 'gear')
 
+    @metrics.timed('render', renderer='pretty_stats')
     def pretty_stats(self):
         """Return a prettyfied Outfit Overview as a string"""
-        temp = [self['Character Name'], '[' + self['Class'] + ',','Level', str(self['Level'])]
-        if self['HM Level']:
-            temp += ['Hongmoon Level', str(self['HM Level'])]
-        temp = ' '.join(temp) + ']'
-        divider = '─'*len(temp)
-        stats = self['Stats']
-        send_this = ['```ruby', temp, divider, 'HP: {}'.format(stats['HP']['Total']),
-                     'Attack Power: {}'.format(stats['Attack Power']['Total']),
-                     'Piercing: {}'.format(stats['Piercing']['Total']),
-                     '+Defense Piercing: {}'.format(stats['Piercing']['Defense Piercing']),
-                     '+Block Piercing: {}'.format(stats['Piercing']['Block Piercing']),
-                     'Accuracy: {0[Total]} ({0[Hit Rate]})'.format(stats['Accuracy']),
-                     'Critical Hit: {0[Total]} ({0[Critical Rate]})'.format(stats['Critical Hit']),
-                     'Critical Damage: {0[Total]} ({0[Increase Damage]})'.format(stats['Critical Damage']), divider,
-                     'Defense: {0[Total]} ({0[Damage Reduction]})'.format(stats['Defense']),
-                     'Evasion: {}'.format(stats['Evasion']['Total']),
-                     '+Evasion Rate: {}'.format(stats['Evasion']['Evasion Rate']),
-                     '+Counter Bonus: {}'.format(stats['Evasion']['Counter Bonus']),
-                     ('Block: {0[Total]}\n'
-                      '+Damage Reduction: {0[Damage Reduction]}\n'
-                      '+Block Bonus: {0[Block Bonus]}\n'
-                      '+Block Rate: {0[Block Rate]}').format(stats['Block']),
-                     'Health Regen (IN/OUT): {0[In Combat]}/{0[Out of Combat]}'.format(stats['Health Regen']),
-                     'Recovery Rate: {}'.format(stats['Recovery']['Total']),
-                     '```']
-        return '\n'.join(send_this)
+        return render.card(self, 'stats')
 
+    @metrics.timed('render', renderer='pretty_outfit')
     def pretty_outfit(self):
         """Return a prettyfied Outfit Overview as a string"""
-        outfit = self['Outfit']
-        o = list(outfit.keys())
-        o.sort()
-        return '\n'.join(['```'] + ['{}\'s Outfit:'.format(self['Character Name'])] +
-                         ['{}: {}'.format(k, outfit[k]) for k in o] + ['```'])
+        return render.card(self, 'outfit')
 
     def avg_dmg(self):
         stats = self['Stats']
@@ -409,23 +598,112 @@ class Character(object):
                        stats['Critical Damage']['Total'],
                        elemental_bonus='100%')
 
-async def get_character(user: str) -> Character:
+async def get_character(user: str, client: Client=None, lazy: bool=False, region: str=None) -> Character:
     """
     Return a Character Object for the given user.
 
     :param user: The user to create an object for
+    :param client: The Client to fetch with, the shared default client is used if not given
+    :param lazy: Only parse the character's Stats when they are first used
+    :param region: The region the character is in ('NA', 'EU'), the client's region if not given
     :return: Returns A Character Object for the given user
     """
     if not isinstance(user, str):
         raise InvalidData('Expected type str for user, found {} instead'.format(type(user).__name__))
     try:
-        return Character(await fetch_profile(user))
+        return Character(await fetch_profile(user, client=client, lazy=lazy, region=region), client=client, lazy=lazy)
     except AttributeError:
         raise CharacterNotFound('Failed to find character "{}"'.format(user))
+    except (InvalidData, ServiceUnavialable):
+        raise
     except Exception as e:
         print('[!] Error:', e)
         raise Exception(e)
 
+async def find_character(user: str, regions=None, first: bool=True, client: Client=None, lazy: bool=False):
+    """
+    Look for a character in every region at once
+
+    :param regions: The regions to look in, every region in REGIONS if not given
+    :param first: Return the Character of whichever region finds it first, the other lookups are cancelled.
+        Otherwise return a dict of region to Character for every region it is in.
+    :raises CharacterNotFound: When no region has the character
+    """
+    client = client or default_client()
+    regions = [_region(r, client) for r in regions] if regions else list(REGIONS)
+    tasks = {asyncio.ensure_future(get_character(user, client=client, lazy=lazy, region=r)): r for r in regions}
+    pending = set(tasks)
+    found = {}
+    errors = []
+    try:
+        while pending and not (first and found):
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    found[tasks[task]] = task.result()
+                elif not isinstance(task.exception(), CharacterNotFound):
+                    errors.append(task.exception())
+    finally:
+        for task in pending:
+            task.cancel()
+    if not found:
+        if errors:
+            raise errors[0]
+        raise CharacterNotFound('Failed to find character "{}" in {}'.format(user, ', '.join(regions)))
+    if first:
+        return next(iter(found.values()))
+    return {r: found[r] for r in regions if r in found}
+
+async def iter_characters(names, concurrency: int=10, client: Client=None, region: str=None):
+    """
+    Fetch many characters, yielding (name, Character) pairs as each one finishes.
+    A name that fails yields (name, exception) instead of stopping the batch.
+
+    :param names: An iterable of character names
+    :param concurrency: The maximum number of characters fetched at once
+    :param client: The Client to fetch with, the shared default client is used if not given
+    :param region: The region the characters are in, the client's region if not given
+    """
+    client = client or default_client()
+    names = iter(names)
+    queue = asyncio.Queue(concurrency)
+
+    async def worker():
+        for name in names:
+            try:
+                result = await get_character(name, client=client, region=region)
+            except Exception as e:
+                result = e
+            await queue.put((name, result))
+        await queue.put(None)
+
+    workers = [asyncio.ensure_future(worker()) for _ in range(concurrency)]
+    running = len(workers)
+    try:
+        while running:
+            result = await queue.get()
+            if result is None:
+                running -= 1
+            else:
+                yield result
+    finally:
+        for w in workers:
+            w.cancel()
+
+async def get_characters(names, concurrency: int=10, client: Client=None, region: str=None) -> dict:
+    """
+    Fetch many characters at once.
+
+    :param names: An iterable of character names
+    :param concurrency: The maximum number of characters fetched at once
+    :param client: The Client to fetch with, the shared default client is used if not given
+    :param region: The region the characters are in, the client's region if not given
+    :return: A dict of name to Character, or to the exception raised for that name (CharacterNotFound, ServiceUnavialable...)
+    """
+    names = list(names)
+    results = {name: result async for name, result in iter_characters(names, concurrency, client, region)}
+    return {name: results[name] for name in names}
+
 async def compare(user1: Character, user2: Character, update=False):
     """A WIP compare fucntion."""
     assert isinstance(user1, Character) and isinstance(user2, Character)
@@ -434,17 +712,8 @@ async def compare(user1: Character, user2: Character, update=False):
         await user2.refresh()
     temp = '{}  -  {}'.format(user1['Character Name'], user2['Character Name'])
     divider = '─'*len(temp)
-    user1 = user1['Stats']
-    user2 = user2['Stats']
-
-    for k,v in user1.items():
-        for k2,v2 in v.items():
-            v[k2] = _float(v2)
-        user1[k] = v
-    for k,v in user2.items():
-        for k2,v2 in v.items():
-            v[k2] = _float(v2)
-        user2[k] = v
+    user1 = {k: {k2: _float(v2) for k2, v2 in v.items()} for k, v in user1['Stats'].items()}
+    user2 = {k: {k2: _float(v2) for k2, v2 in v.items()} for k, v in user2['Stats'].items()}
 
     send_this = [temp, divider, 'HP: {}'.format(_subtract(user1['HP']['Total'], user2['HP']['Total'])),
                  'Attack Power: {}'.format(_subtract(user1['Attack Power']['Total'],
@@ -0,0 +1,236 @@
+import asyncio
+import pickle
+import time
+from collections import OrderedDict
+
+from . import metrics
+from .store import SQLiteStore
+
+
+class Cache(object):
+    """
+    Base class for caches placed in front of fetch_profile, search_user and search_item.
+
+    Backends implement get_entry, set_entry, delete, clear and __len__;
+    this class handles expiry, request coalescing and stale-while-revalidate.
+
+    Counters:
+    hits - Lookups answered from the cache (stale answers included).
+    misses - Lookups that had to fetch.
+    coalesced - Lookups that waited on a fetch already in flight for the same key.
+    stale - Expired entries returned while they were refreshed in the background.
+    evictions - Entries dropped to stay within the size limit.
+
+    :param ttl: Seconds an entry stays fresh.
+    :param stale_while_revalidate: Return expired entries right away and refresh them in the background.
+    """
+    def __init__(self, ttl: float=300, stale_while_revalidate: bool=False):
+        self.ttl = ttl
+        self.stale_while_revalidate = stale_while_revalidate
+        self.hits = self.misses = self.coalesced = self.stale = self.evictions = 0
+        self._pending = {}
+
+    def get_entry(self, key):
+        """Return (value, expires) for a key, or None"""
+        raise NotImplementedError
+
+    def set_entry(self, key, value, expires):
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def __len__(self):
+        raise NotImplementedError
+
+    def get(self, key, default=None):
+        """Return the fresh value for a key, or default"""
+        entry = self.get_entry(key)
+        if entry is None or entry[1] <= time.time():
+            return default
+        return entry[0]
+
+    def set(self, key, value, ttl: float=None):
+        self.set_entry(key, value, time.time() + (self.ttl if ttl is None else ttl))
+
+    def stats(self) -> dict:
+        return {'hits': self.hits, 'misses': self.misses, 'coalesced': self.coalesced, 'stale': self.stale,
+                'evictions': self.evictions, 'size': len(self)}
+
+    async def fetch(self, key, func, ttl: float=None):
+        """
+        Return the cached value for key, calling func() to fill it when needed.
+        Concurrent calls for the same key share a single call to func.
+
+        :param func: A callable returning an awaitable of the value
+        """
+        entry = self.get_entry(key)
+        if entry is not None:
+            value, expires = entry
+            if expires > time.time():
+                self.hits += 1
+                metrics.count('cache.hit')
+                return value
+            if self.stale_while_revalidate:
+                self.hits += 1
+                self.stale += 1
+                metrics.count('cache.hit')
+                metrics.count('cache.stale')
+                if key not in self._pending:
+                    self._refresh(key, func, ttl)
+                return value
+        if key in self._pending:
+            self.coalesced += 1
+            metrics.count('cache.coalesced')
+        else:
+            self.misses += 1
+            metrics.count('cache.miss')
+            self._refresh(key, func, ttl)
+        return await asyncio.shield(self._pending[key])
+
+    def _refresh(self, key, func, ttl):
+        async def run():
+            try:
+                value = await func()
+                self.set(key, value, ttl)
+                return value
+            finally:
+                del self._pending[key]
+        task = self._pending[key] = asyncio.ensure_future(run())
+        # a failed background refresh keeps serving the stale entry
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+
+class LRUCache(Cache):
+    """
+    A bounded in memory cache, the least recently used entries are evicted first.
+
+    :param maxsize: The maximum number of entries kept.
+    """
+    def __init__(self, maxsize: int=1024, ttl: float=300, stale_while_revalidate: bool=False):
+        super().__init__(ttl, stale_while_revalidate)
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+
+    def get_entry(self, key):
+        entry = self._data.get(key)
+        if entry is not None:
+            self._data.move_to_end(key)
+        return entry
+
+    def set_entry(self, key, value, expires):
+        self._data[key] = (value, expires)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def delete(self, key):
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SQLiteCache(Cache, SQLiteStore):
+    """
+    A cache kept in an SQLite file, so it survives restarts and can be shared by
+    every worker process on a host.
+    Values are pickled, the least recently used entries are evicted once the values take more than max_bytes.
+    Reads only write an entry's last use back when it is more than a tenth of the ttl old, so hits rarely
+    need the write lock.
+
+    :param path: The database file, created if missing.
+    :param max_bytes: The maximum total size of the stored values.
+    """
+    PRAGMAS = ('PRAGMA journal_mode=WAL', 'PRAGMA synchronous=NORMAL')
+    SCHEMA = ('CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB NOT NULL, '
+              'size INTEGER NOT NULL, expires REAL NOT NULL, accessed REAL NOT NULL)',
+              'CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)',
+              'CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)',
+              # the total size of the values, kept up to date by every write so it is never summed again
+              'CREATE TABLE IF NOT EXISTS meta (id INTEGER PRIMARY KEY CHECK (id = 0), total INTEGER NOT NULL)',
+              'INSERT OR IGNORE INTO meta SELECT 0, TOTAL(size) FROM cache')
+
+    def __init__(self, path, max_bytes: int=64 * 1024 * 1024, ttl: float=300, stale_while_revalidate: bool=False):
+        Cache.__init__(self, ttl, stale_while_revalidate)
+        SQLiteStore.__init__(self, path)
+        self.max_bytes = max_bytes
+        self.touch = ttl / 10
+
+    def get_entry(self, key):
+        row = self.db.execute('SELECT value, expires, accessed FROM cache WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        now = time.time()
+        if now - row[2] > self.touch:
+            self.db.execute('UPDATE cache SET accessed = ? WHERE key = ?', (now, key))
+        return pickle.loads(row[0]), row[1]
+
+    def _write(self, func):
+        db = self.db
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            func(db)
+            db.execute('COMMIT')
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+
+    def _evict(self, db, key, total):
+        """Delete expired entries, then the least recently used ones, until total fits in max_bytes"""
+        now = time.time()  # the same entries are counted and deleted
+        count, size = db.execute('SELECT COUNT(*), TOTAL(size) FROM cache WHERE expires <= ? AND key != ?',
+                                 (now, key)).fetchone()
+        if count:
+            db.execute('DELETE FROM cache WHERE expires <= ? AND key != ?', (now, key))
+            self.evictions += count
+            total -= int(size)
+        while total > self.max_bytes:
+            rows = db.execute('SELECT key, size FROM cache WHERE key != ? ORDER BY accessed LIMIT 32',
+                              (key,)).fetchall()
+            if not rows:
+                break
+            for old, size in rows:
+                db.execute('DELETE FROM cache WHERE key = ?', (old,))
+                self.evictions += 1
+                total -= size
+                if total <= self.max_bytes:
+                    break
+        return total
+
+    def set_entry(self, key, value, expires):
+        value = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+        def write(db):
+            old = db.execute('SELECT size FROM cache WHERE key = ?', (key,)).fetchone()
+            db.execute('INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?, ?)',
+                       (key, value, len(value), expires, time.time()))
+            total = db.execute('SELECT total FROM meta').fetchone()[0] + len(value) - (old[0] if old else 0)
+            if total > self.max_bytes:
+                total = self._evict(db, key, total)
+            db.execute('UPDATE meta SET total = ?', (total,))
+        self._write(write)
+
+    def delete(self, key):
+        def write(db):
+            old = db.execute('SELECT size FROM cache WHERE key = ?', (key,)).fetchone()
+            if old is not None:
+                db.execute('DELETE FROM cache WHERE key = ?', (key,))
+                db.execute('UPDATE meta SET total = total - ?', old)
+        self._write(write)
+
+    def clear(self):
+        def write(db):
+            db.execute('DELETE FROM cache')
+            db.execute('UPDATE meta SET total = 0')
+        self._write(write)
+
+    def __len__(self):
+        return self.db.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
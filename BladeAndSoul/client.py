@@ -0,0 +1,243 @@
+import asyncio
+import hashlib
+import time
+import zlib
+from collections import OrderedDict
+
+import aiohttp
+
+from . import metrics
+from .errors import CharacterNotFound
+from .items import ItemIndex
+
+try:
+    import brotli
+    ACCEPT_ENCODING = 'gzip, deflate, br'
+except ImportError:
+    ACCEPT_ENCODING = 'gzip, deflate'
+
+
+class Client(object):
+    """
+    A long lived HTTP client shared by every BladeAndSoul fetch.
+
+    Connections are pooled and kept alive between requests so repeated lookups
+    do not pay for a new connector, DNS lookup and TCP handshake every time.
+
+    Usage:
+        async with Client() as client:
+            c = await get_character('Yui', client=client)
+
+    :param limit: Maximum number of simultaneous connections.
+    :param limit_per_host: Maximum number of simultaneous connections to one host.
+    :param timeout: Total time (in seconds) a single request may take.
+    :param connect_timeout: Time (in seconds) allowed for acquiring a connection.
+    :param keepalive_timeout: Time (in seconds) an idle connection is kept open.
+    :param dns_cache: Time (in seconds) resolved hosts are cached for.
+    :param cache: A Cache (see BladeAndSoul.cache) for profiles, searches and market data, nothing is cached if None.
+    :param executor: An Executor (e.g. a ProcessPoolExecutor) pages are parsed in, keeping the CPU bound parsing
+        off the event loop. Pages are parsed on the event loop if None. The executor is not shut down by close().
+    :param item_index: An ItemIndex (see BladeAndSoul.items) remembering which items a market search matches,
+        a new in memory index is used if None.
+    :param region: The region ('NA', 'EU', see bns.REGIONS) looked in when a call is not given one.
+    :param scheduler: A Scheduler (see BladeAndSoul.scheduler) rate limiting and retrying requests, it can be shared
+        by many clients. Requests are made right away and never retried if None.
+    :param conditional: The number of pages kept (compressed) with their ETag/Last-Modified, so they are only
+        downloaded again when changed. 0 turns conditional requests off.
+    :param memo: The number of parsed profile and search pages kept by the hash of their html, a page identical
+        to one of these is not parsed again. 0 turns it off.
+    """
+    def __init__(self, limit: int=100, limit_per_host: int=10, timeout: float=30, connect_timeout: float=10,
+                 keepalive_timeout: float=30, dns_cache: int=300, cache=None, executor=None, item_index=None,
+                 region: str='NA', scheduler=None, conditional: int=1024, memo: int=256):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.keepalive_timeout = keepalive_timeout
+        self.dns_cache = dns_cache
+        self.cache = cache
+        self.executor = executor
+        self.item_index = item_index if item_index is not None else ItemIndex()
+        self.region = region
+        self.scheduler = scheduler
+        self.conditional = conditional
+        self.memo = memo
+        # (url, params) -> (etag, last modified, compressed text)
+        self._validators = OrderedDict()
+        # (parser, html hash, args) -> parse result
+        self._parsed = OrderedDict()
+        self.session = None
+
+    @property
+    def closed(self) -> bool:
+        return self.session is None or self.session.closed
+
+    async def open(self):
+        """Open the underlying session (called automatically on first use)"""
+        if self.closed:
+            connector = aiohttp.TCPConnector(limit=self.limit, limit_per_host=self.limit_per_host,
+                                             keepalive_timeout=self.keepalive_timeout, ttl_dns_cache=self.dns_cache)
+            self.session = aiohttp.ClientSession(connector=connector, headers={'Accept-Encoding': ACCEPT_ENCODING},
+                                                 timeout=aiohttp.ClientTimeout(total=self.timeout,
+                                                                               sock_connect=self.connect_timeout))
+        return self
+
+    async def close(self):
+        """Close the session and every pooled connection"""
+        if not self.closed:
+            await self.session.close()
+        self.session = None
+
+    async def __aenter__(self):
+        return await self.open()
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+    async def cached(self, key, func, ttl: float=None):
+        """Return func() through the cache if there is one"""
+        if self.cache is None:
+            return await func()
+        return await self.cache.fetch(key, func, ttl)
+
+    async def scheduled(self, endpoint, func):
+        """Return await func() through the scheduler if there is one, counting the requests that fail"""
+        try:
+            if self.scheduler is None:
+                return await func()
+            return await self.scheduler.run(endpoint, func)
+        except CharacterNotFound:
+            raise  # an answer, not a failure
+        except Exception as e:
+            metrics.count('fetch.errors', endpoint=endpoint, error=type(e).__name__)
+            raise
+
+    async def parse(self, func, *args):
+        """
+        Call func(*args) in the executor, or right here if there is none.
+        With a process pool func and args must be picklable, so only raw pages go in and plain dicts come out.
+        """
+        if metrics.sink is None:
+            if self.executor is None:
+                return func(*args)
+            return await asyncio.get_event_loop().run_in_executor(self.executor, func, *args)
+        parser = func.__module__.rsplit('.', 1)[-1] + '.' + func.__name__
+        start = time.perf_counter()
+        try:
+            if self.executor is None:
+                result = func(*args)
+            else:
+                result = await asyncio.get_event_loop().run_in_executor(self.executor, func, *args)
+        except Exception as e:
+            metrics.count('parse.errors', parser=parser, error=type(e).__name__)
+            raise
+        metrics.timing('parse', start, parser=parser)
+        return result
+
+    async def parse_page(self, func, html, *args):
+        """
+        parse(func, html, *args), returning the earlier result instead when the same html was parsed with the same
+        arguments before (see memo). The result is shared, it must not be modified.
+        """
+        if not self.memo:
+            return await self.parse(func, html, *args)
+        key = (func.__module__, func.__name__, hashlib.blake2b(html.encode(), digest_size=16).digest(), repr(args))
+        if key in self._parsed:
+            self._parsed.move_to_end(key)
+            metrics.count('parse.skipped', parser=func.__module__.rsplit('.', 1)[-1] + '.' + func.__name__)
+            return self._parsed[key]
+        result = self._parsed[key] = await self.parse(func, html, *args)
+        if len(self._parsed) > self.memo:
+            self._parsed.popitem(last=False)
+        return result
+
+    async def _get(self, url, params, endpoint):
+        """GET url, returning (text, bytes downloaded)"""
+        key = stored = headers = None
+        if self.conditional:
+            key = (url, tuple(sorted(params.items())) if params else ())
+            stored = self._validators.get(key)
+            if stored is not None:
+                headers = {}
+                if stored[0]:
+                    headers['If-None-Match'] = stored[0]
+                if stored[1]:
+                    headers['If-Modified-Since'] = stored[1]
+        async with self.session.get(url, params=params, headers=headers) as re:
+            if re.status == 304 and stored is not None:
+                self._validators.move_to_end(key)
+                metrics.count('fetch.not_modified', endpoint=endpoint)
+                return zlib.decompress(stored[2]).decode(), 0
+            body = await re.read()
+            text = body.decode(re.get_encoding())
+            etag, modified = re.headers.get('ETag'), re.headers.get('Last-Modified')
+            if key is not None and re.status == 200 and (etag or modified):
+                self._validators[key] = (etag, modified, zlib.compress(text.encode()))
+                self._validators.move_to_end(key)
+                if len(self._validators) > self.conditional:
+                    self._validators.popitem(last=False)
+            return text, len(body)
+
+    async def get_text(self, url, params=None, endpoint: str=None) -> str:
+        """
+        GET a url and return the body as text
+
+        :param endpoint: A short name for the url used in metrics (e.g. 'profile'), the url itself if not given
+        """
+        await self.open()
+        endpoint = endpoint or url
+        if metrics.sink is None:
+            return (await self._get(url, params, endpoint))[0]
+        start = time.perf_counter()
+        text, size = await self._get(url, params, endpoint)
+        metrics.timing('fetch', start, endpoint=endpoint)
+        metrics.count('fetch.bytes', size, endpoint=endpoint)
+        return text
+
+
+# event loop -> (its shared client, the task closing the client when the loop shuts down)
+_defaults = {}
+
+
+async def _close_with(loop, client):
+    """Wait until cancelled (asyncio.run cancels the tasks left when it finishes), then close client"""
+    try:
+        await loop.create_future()
+    finally:
+        if _defaults.get(loop, (None,))[0] is client:
+            del _defaults[loop]
+        await client.close()
+
+
+def _abandon(client):
+    """Forget the session of a client whose event loop was closed, its connections went with the loop"""
+    if client.session is not None:
+        connector = client.session.connector
+        client.session.detach()
+        if connector is not None:
+            connector._close()  # nothing can be awaited on a closed loop, this only marks it closed
+    client.session = None
+
+
+def default_client() -> Client:
+    """
+    Return the shared client used when no client is passed in.
+    Every event loop has its own, created on first use and closed when asyncio.run finishes, so code
+    running on several loops (e.g. sync and async calls together) keeps one pooled client on each.
+    """
+    for old in [loop for loop in _defaults if loop.is_closed()]:
+        _abandon(_defaults.pop(old)[0])  # closed without its tasks being cancelled
+    loop = asyncio.get_event_loop()
+    if loop not in _defaults:
+        client = Client()
+        _defaults[loop] = (client, loop.create_task(_close_with(loop, client)))
+    return _defaults[loop][0]
+
+
+async def close():
+    """Close the shared default client of the running event loop"""
+    client, task = _defaults.pop(asyncio.get_event_loop(), (None, None))
+    if client is not None:
+        task.cancel()
+        await client.close()
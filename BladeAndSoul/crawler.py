@@ -0,0 +1,197 @@
+"""
+Crawl the characters of a region, starting from a few names.
+
+The crawl fans out through the other characters on each account and through the
+search box's name suggestions. Everything it finds, and the names still waiting to be
+fetched, is kept in an SQLite file so a stopped or crashed crawl carries on where it was.
+
+    crawler = Crawler('na.db', concurrency=10)
+    await crawler.run(['Yui', 'Fuzen'])
+    for profile in crawler.profiles():
+        ...
+
+Running it again later with max_age only fetches the profiles older than max_age seconds,
+the rest of the graph is walked from the stored profiles without touching the network.
+"""
+import asyncio
+import hashlib
+import json
+import math
+import time
+
+from .bns import fetch_profile, suggest_users
+from .client import Client, default_client
+from .errors import CharacterNotFound
+from .store import SQLiteStore
+
+
+class BloomFilter(object):
+    """
+    A set that only answers "maybe seen" or "not seen", using a fixed amount of memory
+    (about 1.8 bytes a name at error_rate=0.001). Names wrongly reported as seen are skipped.
+
+    :param capacity: The number of names expected
+    :param error_rate: The chance a new name is reported as seen once capacity names were added
+    """
+    def __init__(self, capacity: int, error_rate: float=0.001):
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        a = int.from_bytes(digest[:8], 'little')
+        b = int.from_bytes(digest[8:], 'little') | 1
+        return ((a + i * b) % self.size for i in range(self.hashes))
+
+    def add(self, item):
+        for i in self._positions(item):
+            self.bits[i >> 3] |= 1 << (i & 7)
+
+    def __contains__(self, item):
+        return all(self.bits[i >> 3] & (1 << (i & 7)) for i in self._positions(item))
+
+
+class Crawler(SQLiteStore):
+    """
+    :param path: The SQLite file the crawl is kept in, created if missing.
+    :param client: The Client to fetch with, the shared default client is used if not given.
+    :param region: The region to crawl, the client's region if not given.
+    :param concurrency: The maximum number of profiles fetched at once.
+    :param max_age: Refetch stored profiles older than this many seconds, stored profiles are never refetched if None.
+    :param suggest: Also follow the name suggestions for every fetched character.
+    :param bloom: Remember the names seen in a BloomFilter sized for this many names instead of a set.
+    """
+    SCHEMA = ('CREATE TABLE IF NOT EXISTS frontier (key TEXT PRIMARY KEY, name TEXT NOT NULL)',
+              # profile is NULL for names that turned out not to exist
+              'CREATE TABLE IF NOT EXISTS characters (key TEXT PRIMARY KEY, name TEXT NOT NULL, '
+              'profile TEXT, fetched REAL NOT NULL)')
+
+    def __init__(self, path, client: Client=None, region: str=None, concurrency: int=10, max_age: float=None,
+                 suggest: bool=True, bloom: int=None):
+        super().__init__(path)
+        self.client = client
+        self.region = region
+        self.concurrency = concurrency
+        self.max_age = max_age
+        self.suggest = suggest
+        self.bloom = bloom
+        self.fetched = self.skipped = self.missing = self.errors = 0
+
+    def __len__(self):
+        """The number of characters found"""
+        return self.db.execute('SELECT COUNT(*) FROM characters WHERE profile IS NOT NULL').fetchone()[0]
+
+    def frontier(self) -> list:
+        """The names waiting to be fetched"""
+        return [name for name, in self.db.execute('SELECT name FROM frontier')]
+
+    def profiles(self):
+        """Iterate over the stored profiles (fetch_profile dicts)"""
+        for profile, in self.db.execute('SELECT profile FROM characters WHERE profile IS NOT NULL'):
+            yield json.loads(profile)
+
+    def _stored(self, key):
+        """The stored (profile, fetched) for key, or None"""
+        row = self.db.execute('SELECT profile, fetched FROM characters WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        return (None if row[0] is None else json.loads(row[0])), row[1]
+
+    def _store(self, key, name, profile):
+        db = self.db
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            db.execute('INSERT OR REPLACE INTO characters VALUES (?, ?, ?, ?)',
+                       (key, name, None if profile is None else json.dumps(profile), time.time()))
+            db.execute('DELETE FROM frontier WHERE key = ?', (key,))
+            db.execute('COMMIT')
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+
+    async def run(self, seeds=(), limit: int=None) -> int:
+        """
+        Crawl from seeds and the names left in the frontier by an earlier run.
+
+        :param limit: Stop after fetching this many profiles, the rest stays in the frontier for the next run
+        :return: The number of profiles fetched
+        """
+        client = self.client or default_client()
+        seen = BloomFilter(self.bloom) if self.bloom else set()
+        queue = asyncio.Queue()
+        fetched = self.fetched
+        started = 0
+        done = asyncio.Event()
+
+        def add(name, persist=True):
+            key = name.lower()
+            if key in seen:
+                return
+            seen.add(key)
+            if persist:
+                self.db.execute('INSERT OR IGNORE INTO frontier VALUES (?, ?)', (key, name))
+            queue.put_nowait(name)
+
+        async def visit(name):
+            nonlocal started
+            key = name.lower()
+            stored = self._stored(key)
+            if stored is not None and (self.max_age is None or stored[1] > time.time() - self.max_age):
+                self.skipped += 1
+                self.db.execute('DELETE FROM frontier WHERE key = ?', (key,))
+                if stored[0] is not None:
+                    for other in stored[0]['Other Characters']:
+                        add(other)
+                return
+            if limit is not None and started >= limit:
+                done.set()
+                return
+            started += 1
+            try:
+                profile = await fetch_profile(name, client=client, region=self.region)
+            except CharacterNotFound:
+                self.missing += 1
+                self._store(key, name, None)
+                return
+            if profile['Character Name'].lower() != key:
+                # the search matched someone else, keep them under their own name
+                self.missing += 1
+                self._store(key, name, None)
+                name = profile['Character Name']
+                key = name.lower()
+                if key in seen:
+                    return
+                seen.add(key)
+            self.fetched += 1
+            self._store(key, name, profile)
+            for other in profile['Other Characters']:
+                add(other)
+            if self.suggest:
+                for other in await suggest_users(name, client=client, region=self.region):
+                    add(other)
+
+        async def worker():
+            while True:
+                name = await queue.get()
+                try:
+                    await visit(name)
+                except Exception:
+                    # left in the frontier for the next run
+                    self.errors += 1
+                finally:
+                    queue.task_done()
+
+        for name in self.frontier():
+            add(name, persist=False)
+        for name in seeds:
+            add(name)
+        workers = [asyncio.ensure_future(worker()) for _ in range(self.concurrency)]
+        finished = asyncio.ensure_future(queue.join())
+        stopped = asyncio.ensure_future(done.wait())
+        try:
+            await asyncio.wait([finished, stopped], return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in workers + [finished, stopped]:
+                task.cancel()
+        return self.fetched - fetched
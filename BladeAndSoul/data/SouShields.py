@@ -1,11 +1,10 @@
-import yaml
-from os import path
-p = path.split(path.abspath(__file__))[0]
-with open(path.join(p, 'SS.yml')) as f:
-    SS = yaml.safe_load(f)
-for k,v in SS.items():
-    for k2, v2 in v.items():
-        text = ['{}: {}'.format(k3, v3) for k3, v3 in v2.items()]
-        text.sort()
-        v[k2] = '\n'.join(text)
-    SS[k] = v
\ No newline at end of file
+# SS is built from the compiled dataset the first time it is used, see BladeAndSoul/soulshields.py
+from .. import soulshields
+
+
+def __getattr__(name):
+    global SS
+    if name == 'SS':
+        SS = soulshields.legacy()
+        return SS
+    raise AttributeError(name)
@@ -17,3 +17,7 @@ class FailedToParse(Error):
 class ServiceUnavialable(Error):
     """When BNS is down"""
     pass
+
+class CircuitOpen(ServiceUnavialable):
+    """When requests are failing fast after BNS kept failing, see scheduler.py"""
+    pass
@@ -0,0 +1,239 @@
+"""
+Batch exports of characters or market items to JSONL or Parquet.
+
+Names are read one at a time (in a thread, so a slow stdin never stalls the requests in flight),
+fetched concurrently and written as they finish, so memory stays the same however long the input is.
+With a checkpoint file an interrupted export picks up where it was: the names already written are
+skipped and anything written after the last checkpoint is dropped and fetched again.
+
+    await export(open('names.txt'), 'characters.jsonl', checkpoint='characters.ckpt')
+
+Parquet output (pip install BladeAndSoul.py[parquet]) is a directory of part-NNNNN.parquet files,
+one per batch of rows. See sync.py for using it without async code and __main__.py for the command line.
+"""
+import asyncio
+import json
+import os
+import sys
+
+from .bns import get_character, search_item
+from .client import Client, default_client
+
+KINDS = ('characters', 'items')
+FORMATS = ('jsonl', 'parquet')
+# the Character fields exported as JSON text in Parquet files
+NESTED = ('Stats', 'Gear', 'SoulSheild', 'Outfit', 'Other Characters')
+
+
+class JsonlWriter(object):
+    """A JSON object per line, position is the file size"""
+    def __init__(self, path):
+        self.file = sys.stdout if path == '-' else open(path, 'a', encoding='utf-8')
+
+    def write(self, row: dict):
+        self.file.write(json.dumps(row, ensure_ascii=False) + '\n')
+
+    def flush(self) -> int:
+        self.file.flush()
+        return 0 if self.file is sys.stdout else self.file.tell()
+
+    def truncate(self, position: int):
+        self.file.truncate(position)
+
+    def close(self):
+        if self.file is not sys.stdout:
+            self.file.close()
+
+
+class ParquetWriter(object):
+    """A directory of part-NNNNN.parquet files of batch rows each, position is the number of files"""
+    def __init__(self, path, columns, batch: int=1000):
+        import pyarrow
+        import pyarrow.parquet
+        self.pyarrow = pyarrow
+        self.parquet = pyarrow.parquet
+        self.path = path
+        self.schema = pyarrow.schema(columns)
+        self.batch = batch
+        self.rows = []
+        self.parts = 0
+        os.makedirs(path, exist_ok=True)
+
+    def _part(self, n):
+        return os.path.join(self.path, 'part-{:05d}.parquet'.format(n))
+
+    def write(self, row: dict):
+        self.rows.append(row)
+        if len(self.rows) >= self.batch:
+            self.flush()
+
+    def flush(self) -> int:
+        if self.rows:
+            self.parquet.write_table(self.pyarrow.Table.from_pylist(self.rows, self.schema), self._part(self.parts))
+            self.parts += 1
+            self.rows = []
+        return self.parts
+
+    def truncate(self, position: int):
+        for name in os.listdir(self.path):
+            if name.startswith('part-') and name.endswith('.parquet') and int(name[5:-8]) >= position:
+                os.remove(os.path.join(self.path, name))
+        self.parts = position
+
+    def close(self):
+        self.flush()
+
+
+def _columns(kind):
+    import pyarrow as pa
+    if kind == 'items':
+        return [('query', pa.string()), ('error', pa.string()), ('name', pa.string()), ('icon', pa.string()),
+                ('prices', pa.list_(pa.int64())), ('amounts', pa.list_(pa.int64()))]
+    from .bns import Character
+    return [('query', pa.string()), ('error', pa.string())] + [(key, pa.string()) for key, _ in Character.FIELDS]
+
+
+def _rows(kind, format, name, result) -> list:
+    """The rows written for the result of one name"""
+    error = None if not isinstance(result, Exception) else '{}: {}'.format(type(result).__name__, result)
+    if format == 'jsonl':
+        if error:
+            return [{'query': name, 'error': error}]
+        if kind == 'items':
+            return [{'query': name, 'error': None, 'items': result}]
+        return [{'query': name, 'error': None, 'character': result.to_dict()}]
+    if error:
+        return [{'query': name, 'error': error}]
+    if kind == 'items':
+        return [{'query': name, 'error': None, 'name': x['name'], 'icon': x['icon'],
+                 'prices': [p for p, _ in x['prices']], 'amounts': [a for _, a in x['prices']]} for x in result]
+    row = {k: (json.dumps(v, ensure_ascii=False) if k in NESTED else None if v is None else str(v))
+           for k, v in result.to_dict().items()}
+    row.update(query=name, error=None)
+    return [row]
+
+
+def _save(path, state):
+    with open(path + '.tmp', 'w') as f:
+        json.dump(state, f)
+    os.replace(path + '.tmp', path)
+
+
+async def export(names, output, kind: str='characters', format: str='jsonl', concurrency: int=10,
+                 client: Client=None, region: str=None, display: int=1, checkpoint=None, batch: int=1000) -> int:
+    """
+    Fetch every name and write the results to output as they finish
+
+    :param names: An iterable of names (e.g. an open file, one name a line, blank lines are skipped)
+    :param output: A file for jsonl ('-' for stdout), a directory for parquet
+    :param kind: 'characters' (get_character) or 'items' (search_item)
+    :param format: 'jsonl' or 'parquet'
+    :param concurrency: The maximum number of names fetched at once
+    :param client: The Client to fetch with, the shared default client is used if not given
+    :param region: The region to look in, the client's region if not given
+    :param display: The number of matching items looked up per name (items only)
+    :param checkpoint: A file progress is saved to every batch results, and resumed from if it exists
+    :param batch: Results between checkpoints, and rows per Parquet file
+    :return: The number of names fetched
+    """
+    if kind not in KINDS or format not in FORMATS:
+        raise ValueError('kind must be one of {} and format one of {}'.format(KINDS, FORMATS))
+    if checkpoint and output == '-':
+        raise ValueError('Exports to stdout can not be resumed')
+    client = client or default_client()
+    state = {'done': 0, 'finished': [], 'position': 0, 'fetched': 0}
+    if checkpoint and os.path.exists(checkpoint):
+        with open(checkpoint) as f:
+            state = json.load(f)
+    writer = JsonlWriter(output) if format == 'jsonl' else ParquetWriter(output, _columns(kind), batch)
+    if output != '-':
+        writer.truncate(state['position'])
+    # every line before done, and the lines in finished, are written
+    done = resumed = state['done']
+    finished = set(state['finished'])
+    skip = frozenset(finished)
+    fetched, before = 0, state['fetched']
+
+    async def fetch(name):
+        if kind == 'items':
+            return await search_item(name, display=display, client=client, region=region)
+        return await get_character(name, client=client, region=region)
+
+    def save():
+        state.update(done=done, finished=sorted(finished), position=writer.flush(),
+                     fetched=before + fetched)
+        if checkpoint:
+            _save(checkpoint, state)
+
+    lines = enumerate(names)
+    loop = asyncio.get_event_loop()
+    lock = asyncio.Lock()
+    queue = asyncio.Queue(concurrency)
+    errors = []
+    # lines are read at most window ahead of the first unfinished one, so finished stays small
+    # even while a slow name holds done back
+    window = 4 * concurrency
+    advanced = asyncio.Event()
+
+    async def next_name():
+        async with lock:
+            while True:
+                line = await loop.run_in_executor(None, next, lines, None)
+                if line is None:
+                    return None
+                if line[0] < resumed or line[0] in skip:
+                    continue
+                while line[0] >= done + window:
+                    advanced.clear()
+                    await advanced.wait()
+                return line
+
+    async def worker():
+        while True:
+            try:
+                line = await next_name()
+            except Exception as e:
+                errors.append(e)  # reading names failed, finish what was started
+                line = None
+            if line is None:
+                break
+            i, name = line
+            name = name.strip()
+            if not name:
+                await queue.put((i, None, None))
+                continue
+            try:
+                result = await fetch(name)
+            except Exception as e:
+                result = e
+            await queue.put((i, name, result))
+        await queue.put(None)
+
+    workers = [asyncio.ensure_future(worker()) for _ in range(concurrency)]
+    running = len(workers)
+    try:
+        while running:
+            item = await queue.get()
+            if item is None:
+                running -= 1
+                continue
+            i, name, result = item
+            if name is not None:
+                for row in _rows(kind, format, name, result):
+                    writer.write(row)
+                fetched += 1
+            finished.add(i)
+            while done in finished:
+                finished.remove(done)
+                done += 1
+                advanced.set()
+            if name is not None and fetched % batch == 0:
+                save()
+        save()
+        if errors:
+            raise errors[0]
+    finally:
+        for w in workers:
+            w.cancel()
+        writer.close()
+    return fetched
@@ -0,0 +1,225 @@
+"""
+The 'lxml' parse engine.
+
+Produces the same results as bns.parse_profile and bns.parse_search, but builds an
+lxml tree and runs XPath expressions compiled once at import time instead of
+building a BeautifulSoup tree and searching the whole document for every field.
+Like the soup engine, a missing element raises AttributeError.
+"""
+import time
+
+from lxml import etree, html as lxml_html
+
+from . import metrics
+from .errors import ServiceUnavialable
+from .models import LazyStats
+
+
+def _cls(name):
+    """XPath test matching bs4's class_=name (one class, or the exact class string when it has spaces)"""
+    if ' ' in name:
+        return 'normalize-space(@class)="{}"'.format(name)
+    return 'contains(concat(" ", normalize-space(@class), " "), " {} ")'.format(name)
+
+
+def _first(tag, cls=None):
+    """The first descendant tag, like soup.find(tag, class_=cls)"""
+    return etree.XPath('(.//{}{})[1]'.format(tag, '[{}]'.format(_cls(cls)) if cls else ''))
+
+
+def _all(tag, cls=None):
+    """Every descendant tag, like soup.find_all(tag, class_=cls)"""
+    return etree.XPath('.//{}{}'.format(tag, '[{}]'.format(_cls(cls)) if cls else ''))
+
+
+ERROR = etree.XPath('//div[@id="container"][normalize-space(@class)="pCharacter error"]')
+ACCOUNT = etree.XPath('(//a[@href="#"])[1]')
+DT, DD, DL, SPAN, A, IMG, TH, TD, DIV, TABLE, SECTION = (_first(t) for t in
+                                                        ('dt', 'dd', 'dl', 'span', 'a', 'img', 'th', 'td', 'div',
+                                                         'table', 'section'))
+ALL_LI, ALL_DT, ALL_DD, ALL_TR = (_all(t) for t in ('li', 'dt', 'dd', 'tr'))
+DESC = _first('dd', 'desc')
+ATTACK = _first('div', 'attack')
+DEFENSE = _first('div', 'defense')
+TITLE = _first('span', 'title')
+STAT_POINT = _first('span', 'stat-point')
+ALL_TITLE = _all('span', 'title')
+ALL_STAT_POINT = _all('span', 'stat-point')
+NAME = _first('div', 'name')
+EMPTY = _first('span', 'empty')
+HAS_IMG = etree.XPath('boolean(.//span[.//img])')
+GEM = _first('div', 'wrapGem')
+CHARM_EFFECT = _first('div', 'lyCharmEffect')
+DISCRIPTION = _all('p', 'discription')
+SET_EFFECT = _all('p', 'setEffect')
+OTHER = _first('dd', 'other')
+SEARCH_LIST = _first('div', 'searchList')
+GEAR = {k: _first('div', v) for k, v in (('Weapon', 'wrapWeapon'),
+                                         ('Necklace', 'wrapAccessory necklace'),
+                                         ('Earring', 'wrapAccessory earring'),
+                                         ('Ring', 'wrapAccessory ring'),
+                                         ('Bracelet', 'wrapAccessory bracelet'),
+                                         ('Belt', 'wrapAccessory belt'),
+                                         ('Soul', 'wrapAccessory soul'))}
+OUTFIT = {k: _first('div', v) for k, v in (('Clothes', 'wrapAccessory clothes'),
+                                           ('Head', 'wrapAccessory tire'),
+                                           ('Face', 'wrapAccessory faceDecoration'),
+                                           ('Adornment', 'wrapAccessory clothesDecoration'))}
+
+
+def _find(xpath, el):
+    """Run a (...)[1] expression, raising AttributeError like soup's None.attribute would"""
+    if el is None:
+        raise AttributeError
+    found = xpath(el)
+    if not found:
+        raise AttributeError
+    return found[0]
+
+
+def _text(el) -> str:
+    return el.text_content()
+
+
+def get_name(el):
+    """bns.get_name for lxml elements"""
+    if el is None:
+        return None
+    name = NAME(el)
+    if not name or EMPTY(name[0]):
+        return None
+    span = SPAN(name[0])
+    return _text(span[0]) if span else None
+
+
+def _stats(dts, dds):
+    sub = [z for z in (dict(zip(map(_text, ALL_TITLE(x)), map(_text, ALL_STAT_POINT(x)))) for x in dds) if len(z)]
+    return dict(zip([_text(_find(TITLE, t)) for t in dts], [_text(_find(STAT_POINT, t)) for t in dts])), sub
+
+
+def _lines(el):
+    return '\n'.join(t.strip() for t in _text(el).strip().split('\n') if t.strip() != '')
+
+
+def set_bonus(el) -> tuple:
+    """bns.set_bonus for lxml elements"""
+    # bs4 tags hash by their markup, so identical descriptions collapse the same way here
+    pairs = {}
+    for d, e in zip(DISCRIPTION(el), SET_EFFECT(el)):
+        key = etree.tostring(d, with_tail=False)
+        pairs[key] = (pairs[key][0] if key in pairs else d, e)
+    return (':\n'.join((_lines(d), _lines(e))) for d, e in pairs.values())
+
+
+def parse_search(html) -> list:
+    """bns.parse_search using lxml"""
+    timed = metrics.sink is not None
+    if timed:
+        start = time.perf_counter()
+    doc = lxml_html.document_fromstring(html)
+    if timed:
+        metrics.timing('parse.tree', start, parser='lxml')
+        start = time.perf_counter()
+    if ERROR(doc) and not SEARCH_LIST(doc):
+        raise ServiceUnavialable('Cannot Access BNS At this time')
+    search = _find(SEARCH_LIST, doc)
+    r = [(_text(_find(A, _find(DT, _find(DL, x)))),
+          [_text(b) for b in ALL_LI(_find(DD, _find(OTHER, _find(DL, x))))]) for x in ALL_LI(search) if DT(x)]
+    if timed:
+        metrics.timing('parse.extract', start, parser='lxml')
+    return r
+
+
+def _parse_stats(doc) -> dict:
+    # ATTACK
+    ATK = _find(DL, _find(ATTACK, doc))
+    ATK, sub = _stats(ALL_DT(ATK)[:-2], ALL_DD(ATK))
+    sub = sub[:-2]
+    del ATK['Mastery']
+    ATK = {k: {'Total': v} for k, v in ATK.items()}
+    ATK['Attack Power'].update(sub[0])
+    ATK['Piercing'].update(sub[2])
+    ATK['Accuracy'].update(sub[3])
+    ATK['Critical Hit'].update(sub[5])
+    ATK['Critical Damage'].update(sub[6])
+
+    # DEFENSE
+    Defense = _find(DEFENSE, doc)
+    Defense, sub = _stats(ALL_DT(_find(DL, Defense)), ALL_DD(Defense))
+    Defense = {k: {'Total': v} for k, v in Defense.items()}
+    del Defense['Debuff Defense']
+    Defense['Defense'].update(sub[1])
+    Defense['Evolved Defense'].update(sub[2])
+    Defense['Evasion'].update(sub[3])
+    Defense['Block'].update(sub[4])
+    Defense['Critical Defense'].update(sub[5])
+    Defense['Health Regen'].update(sub[7])
+    Defense['Recovery'].update(sub[8])
+
+    ATK.update(Defense)
+    return ATK
+
+
+def parse_stats(html) -> dict:
+    """bns.parse_stats using lxml"""
+    return _parse_stats(lxml_html.document_fromstring(html))
+
+
+def parse_profile(html, other_chars: list, lazy: bool=False, region: str='NA') -> dict:
+    """bns.parse_profile using lxml"""
+    timed = metrics.sink is not None
+    if timed:
+        start = time.perf_counter()
+    doc = lxml_html.document_fromstring(html)
+    if timed:
+        metrics.timing('parse.tree', start, parser='lxml')
+        start = time.perf_counter()
+    if ERROR(doc):
+        raise ServiceUnavialable('Cannot Access BNS At this time')
+    # INFORMATION
+    Name = _text(_find(ACCOUNT, doc))
+    CharacterName = _text(_find(SPAN, _find(DT, doc)))[1:-1]
+    Class, Level, Server, *Faction = [_text(x).strip().replace('\xa0', ' ') for x in ALL_LI(_find(DESC, doc))]
+    if len(Faction) == 0:
+        Clan = Rank = Faction = None
+    else:
+        Clan = Faction[1] if len(Faction) > 1 else None
+        Faction = Faction[0].split()
+        Rank = ' '.join(Faction[2:])
+        Faction = ' '.join(Faction[:2])
+    Level = Level.split()
+    HM = int(Level[-1]) if len(Level) > 2 else 0
+    Level = int(Level[1])
+
+    Stats = LazyStats(html, parse_stats) if lazy else _parse_stats(doc)
+
+    # SoulSheild
+    SS = _find(GEM, doc)
+    BONUS = ()
+    Shield = ()
+    if HAS_IMG(SS):
+        BONUS = set_bonus(_find(CHARM_EFFECT, SS))
+        Shield = [': '.join([_text(_find(TH, tr)), _text(_find(TD, tr))]) for tr in ALL_TR(_find(TABLE, SS))]
+
+    # PROFILEPICTURE
+    Picture = _find(IMG, _find(DIV, _find(DIV, _find(SECTION, doc)))).get('src')
+    r = {'Account Name': Name,
+         'Character Name': CharacterName,
+         'Class': Class,
+         'Level': Level,
+         'HM Level': HM,
+         'Server': Server,
+         'Faction': Faction,
+         'Clan': Clan,
+         'Faction Rank': Rank,
+         'Picture': Picture,
+         'Stats': Stats,
+         'Gear': {k: get_name(next(iter(v(doc)), None)) for k, v in GEAR.items()},
+         'SoulSheild': Shield,
+         'Set Bonus': '\n\n'.join(BONUS),
+         'Outfit': {k: get_name(next(iter(v(doc)), None)) for k, v in OUTFIT.items()},
+         'Other Characters': other_chars,
+         'Region': region}
+    if timed:
+        metrics.timing('parse.extract', start, parser='lxml')
+    return r
@@ -0,0 +1,179 @@
+"""
+Market price history.
+
+Listings returned by get_item_data/search_item are appended to a small columnar
+store (one flat binary file per column) and queried with numpy.
+A listing that was already up at the previous snapshot of its item is not written
+again, so each row is a listing the first time it was seen.
+
+Requires numpy (pip install BladeAndSoul.py[history]).
+"""
+import json
+import os
+import time
+from array import array
+from collections import Counter
+
+import numpy as np
+
+from .bns import search_item
+
+# column name: (array typecode, numpy dtype)
+COLUMNS = {'item': ('i', np.int32), 'time': ('d', np.float64), 'price': ('q', np.int64), 'amount': ('q', np.int64)}
+
+
+class MarketHistory(object):
+    """
+    A market history store kept in a directory.
+    Only one process should write to a store at a time, any number can read it.
+
+    A snapshot is committed by replacing manifest.json (the row count, item ids and last listings) after its
+    rows are appended, rows past the committed count (from a writer that died) are cut off before the next append.
+
+    :param path: The directory to keep the store in, created if missing.
+    """
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        manifest = self._load('manifest.json', {'rows': 0, 'items': {}, 'last': {}})
+        self.rows = manifest['rows']
+        self.items = manifest['items']
+        self.last = {k: Counter({tuple(listing): n for *listing, n in v}) for k, v in manifest['last'].items()}
+        self._columns = None
+        self._version = None
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def _load(self, name, default):
+        try:
+            with open(self._file(name)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return default
+
+    def _save(self, name, data):
+        temp = self._file(name + '.tmp')
+        with open(temp, 'w') as f:
+            json.dump(data, f)
+        os.replace(temp, self._file(name))
+
+    def record(self, items, timestamp: float=None) -> int:
+        """
+        Append a snapshot of market data, skipping listings unchanged since the item's last snapshot.
+
+        :param items: A list of dicts from search_item/get_item_data (either format)
+        :param timestamp: When the snapshot was taken, defaults to now
+        :return: The number of listings written
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        rows = {k: array(code) for k, (code, _) in COLUMNS.items()}
+        last = dict(self.last)
+        ids = dict(self.items)
+        for data in items:
+            if 'amounts' in data:
+                listings = Counter(zip(data['prices'], data['amounts']))
+            else:
+                listings = Counter(map(tuple, data['prices']))
+            name = data['name']
+            new = listings - last.get(name, Counter())
+            last[name] = listings
+            item = ids.setdefault(name, len(ids))
+            for (price, amount), n in new.items():
+                for _ in range(n):
+                    rows['item'].append(item)
+                    rows['time'].append(timestamp)
+                    rows['price'].append(price)
+                    rows['amount'].append(amount)
+        for k, column in rows.items():
+            with open(self._file(k + '.bin'), 'ab') as f:
+                f.truncate(self.rows * column.itemsize)  # rows a failed record left behind
+                column.tofile(f)
+        self._save('manifest.json', {'rows': self.rows + len(rows['item']), 'items': ids,
+                                     'last': {k: [[*listing, n] for listing, n in v.items()] for k, v in last.items()}})
+        self.rows += len(rows['item'])
+        self.items, self.last = ids, last
+        return len(rows['item'])
+
+    async def snapshot(self, item, display: int=1, client=None, timestamp: float=None) -> int:
+        """Fetch an item with search_item and record it, returns the number of listings written"""
+        return self.record(await search_item(item, display, client=client), timestamp)
+
+    @property
+    def columns(self) -> dict:
+        """Every committed row of every column as a numpy array, reloaded when the store grew"""
+        try:
+            version = os.stat(self._file('manifest.json')).st_mtime_ns
+        except FileNotFoundError:
+            version = None
+        if version != self._version or self._columns is None:
+            if version is not None and version != self._version:
+                manifest = self._load('manifest.json', {})  # maybe written by another process
+                self.rows, self.items = manifest.get('rows', self.rows), manifest.get('items', self.items)
+            self._columns = {k: np.fromfile(self._file(k + '.bin'), dtype, self.rows) if self.rows else
+                             np.empty(0, dtype) for k, (_, dtype) in COLUMNS.items()}
+            self._version = version
+        return self._columns
+
+    def __len__(self):
+        return len(self.columns['item'])
+
+    def listings(self, item, start: float=None, end: float=None) -> tuple:
+        """
+        Return (times, prices, amounts) numpy arrays of an item's listings first seen in [start, end)
+        """
+        c = self.columns
+        if item not in self.items:
+            return np.empty(0, np.float64), np.empty(0, np.int64), np.empty(0, np.int64)
+        mask = c['item'] == self.items[item]
+        if start is not None:
+            mask &= c['time'] >= start
+        if end is not None:
+            mask &= c['time'] < end
+        return c['time'][mask], c['price'][mask], c['amount'][mask]
+
+    def summary(self, item, start: float=None, end: float=None, percentiles=(5, 25, 75, 95)) -> dict:
+        """
+        Price statistics (in copper) of an item's listings first seen in [start, end)
+
+        :return: {'listings', 'volume', 'min', 'median', 'max', 'vwap', 'percentiles': {p: price}}, None if there are no listings
+        """
+        _, prices, amounts = self.listings(item, start, end)
+        if not len(prices):
+            return None
+        volume = int(amounts.sum())
+        return {'listings': len(prices),
+                'volume': volume,
+                'min': int(prices.min()),
+                'median': float(np.median(prices)),
+                'max': int(prices.max()),
+                'vwap': float((prices * amounts).sum() / volume) if volume else float(prices.mean()),
+                'percentiles': dict(zip(percentiles, np.percentile(prices, percentiles).tolist()))}
+
+    def buckets(self, item, width: float, start: float=None, end: float=None) -> dict:
+        """
+        Per time bucket statistics of an item's listings, computed in one vectorized pass.
+
+        :param width: The width of a bucket in seconds, buckets are aligned to multiples of width
+        :return: A dict of equally long numpy arrays:
+            'start', 'listings', 'volume', 'min', 'median', 'max', 'vwap'
+        """
+        times, prices, amounts = self.listings(item, start, end)
+        bucket = (times // width).astype(np.int64)
+        order = np.lexsort((prices, bucket))
+        bucket, prices, amounts = bucket[order], prices[order], amounts[order]
+        keys, first, counts = np.unique(bucket, return_index=True, return_counts=True)
+        if not len(keys):
+            return {k: np.empty(0) for k in ('start', 'listings', 'volume', 'min', 'median', 'max', 'vwap')}
+        last = first + counts - 1
+        volume = np.add.reduceat(amounts, first)
+        value = np.add.reduceat(prices * amounts, first)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            vwap = np.where(volume > 0, value / volume, np.nan)
+        return {'start': keys * width,
+                'listings': counts,
+                'volume': volume,
+                'min': prices[first],
+                'median': (prices[first + (counts - 1) // 2] + prices[first + counts // 2]) / 2,
+                'max': prices[last],
+                'vwap': vwap}
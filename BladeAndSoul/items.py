@@ -0,0 +1,79 @@
+"""
+The item name index used by search_item.
+
+Market searches first ask the item suggestion service which items match the query.
+ItemIndex remembers those answers (for ttl seconds), and the canonical name and icon of
+every item the market returned, so a repeated search goes straight to the market.
+Give it a path to keep it across restarts:
+
+    client = Client(item_index=ItemIndex('items.db'))
+"""
+import json
+import re
+import time
+
+from .store import SQLiteStore
+
+# an optional /**/ and the callback name before the opening parenthesis
+JSONP_PREFIX = re.compile(r'\s*(?:/\*\*/\s*)?[A-Za-z_$][\w$.]*\s*\(\s*')
+_decoder = json.JSONDecoder()
+
+
+def decode_jsonp(text):
+    """
+    Decode a JSONP response (callback({...});) or plain JSON.
+    Decoding stops at the end of the value, whatever follows it (");", whitespace, line breaks) is ignored.
+
+    :raises ValueError: When there is no JSON value
+    """
+    match = JSONP_PREFIX.match(text)
+    start = match.end() if match else len(text) - len(text.lstrip())
+    return _decoder.raw_decode(text, start)[0]
+
+
+def normalize(name) -> str:
+    """The spelling names are indexed by, lower case with single spaces"""
+    return ' '.join(name.lower().split())
+
+
+class ItemIndex(SQLiteStore):
+    """
+    :param path: The SQLite file the index is kept in, kept in memory if None.
+    :param ttl: Seconds the item suggestions for a query are used before they are asked for again.
+    """
+    SCHEMA = ('CREATE TABLE IF NOT EXISTS queries (region TEXT, query TEXT, display INTEGER NOT NULL, '
+              'names TEXT NOT NULL, expires REAL NOT NULL, PRIMARY KEY (region, query))',
+              'CREATE TABLE IF NOT EXISTS items (region TEXT, key TEXT, name TEXT NOT NULL, '
+              'icon TEXT, PRIMARY KEY (region, key))')
+
+    def __init__(self, path=None, ttl: float=24 * 60 * 60):
+        super().__init__(path)
+        self.ttl = ttl
+        self.hits = self.misses = 0
+
+    def names(self, region, query, display: int):
+        """The item names suggested for query, None if they aren't known for this display (or have expired)"""
+        row = self.db.execute('SELECT names, display, expires FROM queries WHERE region = ? AND query = ?',
+                              (region, normalize(query))).fetchone()
+        if row is None or row[1] < display or row[2] <= time.time():
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(row[0])[:display]
+
+    def set_names(self, region, query, display: int, names: list):
+        self.db.execute('INSERT OR REPLACE INTO queries VALUES (?, ?, ?, ?, ?)',
+                        (region, normalize(query), display, json.dumps(names), time.time() + self.ttl))
+
+    def item(self, region, name):
+        """(canonical name, icon url) of an item the market has returned, or None"""
+        return self.db.execute('SELECT name, icon FROM items WHERE region = ? AND key = ?',
+                               (region, normalize(name))).fetchone()
+
+    def set_items(self, region, items):
+        """Remember the (name, icon url) of market items"""
+        self.db.executemany('INSERT OR REPLACE INTO items VALUES (?, ?, ?, ?)',
+                            [(region, normalize(name), name, icon) for name, icon in items])
+
+    def __len__(self):
+        return self.db.execute('SELECT COUNT(*) FROM items').fetchone()[0]
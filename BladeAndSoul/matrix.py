@@ -0,0 +1,104 @@
+"""
+Batch stat comparisons over many characters.
+
+StatMatrix reads the stats of many Characters into one numpy array once, then ranks,
+diffs and computes average damage for all of them in vectorized passes.
+The characters are only read, never modified.
+
+Requires numpy (pip install BladeAndSoul.py[matrix]).
+"""
+import numpy as np
+
+from .models import Stat, to_number
+
+# the stats read by default, as (stat, key)
+COLUMNS = (('HP', 'Total'), ('Attack Power', 'Total'), ('Piercing', 'Total'), ('Piercing', 'Defense Piercing'),
+           ('Piercing', 'Block Piercing'), ('Accuracy', 'Total'), ('Accuracy', 'Hit Rate'),
+           ('Critical Hit', 'Total'), ('Critical Hit', 'Critical Rate'), ('Critical Damage', 'Total'),
+           ('Critical Damage', 'Increase Damage'), ('Defense', 'Total'), ('Defense', 'Damage Reduction'),
+           ('Evasion', 'Total'), ('Evasion', 'Evasion Rate'), ('Block', 'Total'), ('Block', 'Block Rate'),
+           ('Critical Defense', 'Total'), ('Health Regen', 'In Combat'), ('Health Regen', 'Out of Combat'),
+           ('Recovery', 'Total'))
+
+
+def _number(stat, key) -> float:
+    if isinstance(stat, Stat):
+        value = stat.value(key)
+    else:
+        value = to_number(stat[key])[0]
+    return float(value) if isinstance(value, (int, float)) else np.nan
+
+
+class StatMatrix(object):
+    """
+    The stats of many characters as a (characters x columns) float array, missing values are nan.
+
+    :param characters: Characters (or fetch_profile dicts)
+    :param columns: The (stat, key) pairs to read, see COLUMNS
+    """
+    def __init__(self, characters, columns=COLUMNS):
+        self.columns = list(columns)
+        self.index = {c: i for i, c in enumerate(self.columns)}
+        self.names = []
+        rows = []
+        for c in characters:
+            stats = c['Stats']
+            self.names.append(c['Character Name'])
+            rows.append([_number(stats[s], k) if s in stats and k in stats[s] else np.nan for s, k in self.columns])
+        self.values = np.array(rows, dtype=np.float64).reshape(len(rows), len(self.columns))
+        self.rows = {name: i for i, name in enumerate(self.names)}
+
+    def __len__(self):
+        return len(self.names)
+
+    def column(self, stat, key='Total') -> np.ndarray:
+        return self.values[:, self.index[(stat, key)]]
+
+    def avg_dmg(self, elemental_bonus: float=100) -> tuple:
+        """
+        bns.avg_dmg for every character at once
+
+        :return: (without blue buff, with blue buff) arrays
+        """
+        attack_power = self.column('Attack Power')
+        crit_rate = self.column('Critical Hit', 'Critical Rate')
+        crit_damage = self.column('Critical Damage')
+        result = attack_power * (1 - (crit_rate * 0.01) + (crit_rate * crit_damage * 0.0001))
+        buffed = crit_rate + 50
+        result2 = np.where(crit_rate < 60,
+                           attack_power * (1 - (buffed * 0.01) + buffed * (crit_damage + 40) * .0001),
+                           attack_power * ((crit_damage + 40) * .01))
+        if elemental_bonus not in (0, 100):
+            result = result * (elemental_bonus * 0.01)
+            result2 = result2 * (elemental_bonus * 0.01)
+        return np.round(result, 2), np.round(result2, 2)
+
+    def diff(self, name1, name2) -> dict:
+        """Every column of name1 minus name2"""
+        return dict(zip(self.columns, (self.values[self.rows[name1]] - self.values[self.rows[name2]]).tolist()))
+
+    def diff_all(self, name) -> np.ndarray:
+        """Every character's stats minus name's stats (one vs all)"""
+        return self.values - self.values[self.rows[name]]
+
+    def pairwise(self, stat, key='Total') -> np.ndarray:
+        """An (n x n) array of column[i] - column[j]"""
+        column = self.column(stat, key)
+        return column[:, None] - column[None, :]
+
+    def top(self, k: int, values) -> list:
+        """
+        The k highest characters by values
+
+        :param values: A (stat, key) column, or an array with a value per character (e.g. avg_dmg()[1])
+        :return: A list of (name, value), highest first
+        """
+        if isinstance(values, tuple):
+            values = self.column(*values)
+        values = np.where(np.isnan(values), -np.inf, values)
+        k = min(k, len(values))
+        if k <= 0:
+            return []
+        best = np.argpartition(-values, k - 1)[:k]
+        best = best[np.argsort(-values[best], kind='stable')]
+        return [(self.names[i], float(values[i])) for i in best]
@@ -0,0 +1,157 @@
+"""
+Instrumentation hooks.
+
+Nothing is measured until a sink is set, every hook is a single "is None" check until then.
+
+    from BladeAndSoul import metrics
+    metrics.use(metrics.Recorder())   # or StatsdSink(statsd_client), PrometheusSink() ...
+    ...
+    metrics.sink.summary()
+
+Names reported:
+fetch - Network time of a request (tags: endpoint), fetch.bytes - Body size (tags: endpoint).
+fetch.errors - Requests that failed after any retries, from the network, the error page or bad data
+(tags: endpoint, error - the exception type). A character that does not exist is not counted.
+fetch.not_modified - Requests answered 304 Not Modified, the kept page is used (tags: endpoint).
+fetch.retries - Requests retried (tags: endpoint, error), fetch.rejected - Requests failed fast by a circuit breaker (tags: endpoint).
+parse - Total parse time (tags: parser - the parse function), parse.errors - Pages that failed to parse (tags: parser, error),
+parse.tree - Building the soup/lxml tree,
+parse.extract - Pulling the fields out of the tree (tree and extract are only seen when parsing on the event loop).
+parse.skipped - Pages identical to one parsed before, which were not parsed again (tags: parser).
+render - Time spent in a Character.pretty_* function (tags: renderer).
+cache.hit, cache.miss, cache.coalesced, cache.stale - Cache lookups.
+"""
+import functools
+import time
+
+# the active sink, None when disabled
+sink = None
+
+
+def use(new_sink):
+    """Send metrics to new_sink, None turns them off"""
+    global sink
+    sink = new_sink
+    return new_sink
+
+
+def timing(name, start: float, **tags):
+    """Report the time since start (a time.perf_counter() value)"""
+    if sink is not None:
+        sink.timing(name, time.perf_counter() - start, tags)
+
+
+def count(name, value=1, **tags):
+    if sink is not None:
+        sink.count(name, value, tags)
+
+
+def timed(name, **tags):
+    """Decorator reporting the time a function takes"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if sink is None:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                sink.timing(name, time.perf_counter() - start, tags)
+        return wrapper
+    return decorator
+
+
+class Sink(object):
+    """The interface every sink implements"""
+    def timing(self, name, seconds: float, tags: dict):
+        pass
+
+    def count(self, name, value, tags: dict):
+        pass
+
+
+class Recorder(Sink):
+    """Keeps totals in memory, handy for tests and quick looks"""
+    def __init__(self):
+        self.timings = {}
+        self.counts = {}
+
+    @staticmethod
+    def _key(name, tags):
+        return (name,) + tuple(sorted(tags.items()))
+
+    def timing(self, name, seconds, tags):
+        n, total = self.timings.get(self._key(name, tags), (0, 0.0))
+        self.timings[self._key(name, tags)] = (n + 1, total + seconds)
+
+    def count(self, name, value, tags):
+        key = self._key(name, tags)
+        self.counts[key] = self.counts.get(key, 0) + value
+
+    def total(self, name, **tags):
+        """The sum of a count over every tag set including tags"""
+        tags = set(tags.items())
+        return sum(v for k, v in self.counts.items() if k[0] == name and tags <= set(k[1:]))
+
+    def summary(self) -> dict:
+        """{name: {'count', 'seconds', 'mean'}} for timings, {name: total} for counts, plus the cache hit ratio"""
+        r = {}
+        for (name, *_), (n, total) in self.timings.items():
+            old = r.setdefault(name, {'count': 0, 'seconds': 0.0})
+            old['count'] += n
+            old['seconds'] += total
+        for v in r.values():
+            v['mean'] = v['seconds'] / v['count']
+        for (name, *_), value in self.counts.items():
+            r[name] = r.get(name, 0) + value
+        lookups = sum(r.get('cache.' + k, 0) for k in ('hit', 'miss', 'coalesced'))
+        if lookups:
+            r['cache.hit_ratio'] = (r.get('cache.hit', 0) + r.get('cache.coalesced', 0)) / lookups
+        return r
+
+
+class StatsdSink(Sink):
+    """
+    Sends to a statsd client (anything with timing(name, ms) and incr(name, count), e.g. statsd.StatsClient).
+    Tags are appended to the name: fetch.bytes.endpoint_profile
+    """
+    def __init__(self, client, prefix='bns'):
+        self.client = client
+        self.prefix = prefix
+
+    def _name(self, name, tags):
+        return '.'.join([self.prefix, name] + ['{}_{}'.format(k, v) for k, v in sorted(tags.items())])
+
+    def timing(self, name, seconds, tags):
+        self.client.timing(self._name(name, tags), seconds * 1000)
+
+    def count(self, name, value, tags):
+        self.client.incr(self._name(name, tags), value)
+
+
+class PrometheusSink(Sink):
+    """
+    Records into prometheus_client Histograms (timings, in seconds) and Counters, created on first use.
+    Metric names have "." replaced with "_" and are prefixed: bns_fetch_bytes_total
+    """
+    def __init__(self, registry=None, prefix='bns'):
+        import prometheus_client
+        self.prometheus = prometheus_client
+        self.registry = registry or prometheus_client.REGISTRY
+        self.prefix = prefix
+        self.metrics = {}
+
+    def _metric(self, kind, name, tags):
+        key = (kind, name, tuple(sorted(tags)))
+        if key not in self.metrics:
+            self.metrics[key] = kind('_'.join([self.prefix, name.replace('.', '_')]), name, sorted(tags),
+                                     registry=self.registry)
+        metric = self.metrics[key]
+        return metric.labels(**tags) if tags else metric
+
+    def timing(self, name, seconds, tags):
+        self._metric(self.prometheus.Histogram, name + '.seconds', tags).observe(seconds)
+
+    def count(self, name, value, tags):
+        self._metric(self.prometheus.Counter, name, tags).inc(value)
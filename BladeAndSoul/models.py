@@ -0,0 +1,136 @@
+"""
+Compact containers used by Character.
+
+Stats are stored as numbers, and read back through [] as the strings the profile page
+showed ('45.30%', '1021'), so they format exactly as the plain dicts did.
+Field names and formats are interned and shared by every instance with the same layout.
+"""
+import re
+import zlib
+from collections.abc import Mapping
+
+# numbers that read back unchanged once converted (no leading zeros)
+NUMBER = re.compile(r'^(-?(?:0|[1-9]\d*))(?:\.(\d+))?(%?)$')
+_layouts = {}
+
+
+def _intern(layout: tuple) -> tuple:
+    return _layouts.setdefault(layout, layout)
+
+
+def to_number(text):
+    """
+    Convert a stat string to (number, format), format is None when it is not a number
+    """
+    match = NUMBER.match(text) if isinstance(text, str) else None
+    if match is None:
+        return text, None
+    whole, decimals, percent = match.groups()
+    if decimals is None:
+        return int(whole), '{}' + percent
+    return float(text.rstrip('%')), '{:.%df}%s' % (len(decimals), percent)
+
+
+class Stat(Mapping):
+    """
+    One stat with its details, e.g. Critical Hit -> {'Total': '1405', 'Critical Rate': '45.30%'}
+
+    stat[key] returns the value as shown on the profile, stat.value(key) returns it as a number.
+    """
+    __slots__ = ('_layout', '_values')
+
+    def __init__(self, data: dict):
+        values, formats = zip(*map(to_number, data.values())) if data else ((), ())
+        self._layout = _intern((tuple(data), formats))
+        self._values = values
+
+    def value(self, key):
+        """The number for key (the text for values that aren't numbers)"""
+        return self._values[self._layout[0].index(key)]
+
+    def numbers(self) -> dict:
+        return dict(zip(self._layout[0], self._values))
+
+    def __getitem__(self, key):
+        keys, formats = self._layout
+        try:
+            i = keys.index(key)
+        except ValueError:
+            raise KeyError(key)
+        return self._values[i] if formats[i] is None else formats[i].format(self._values[i])
+
+    def __iter__(self):
+        return iter(self._layout[0])
+
+    def __len__(self):
+        return len(self._layout[0])
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+class Stats(dict):
+    """Every Stat of a character by name, e.g. stats['Attack Power']['Total']"""
+    __slots__ = ()
+
+    def __init__(self, data: dict):
+        super().__init__((k, v if isinstance(v, Stat) else Stat(v)) for k, v in data.items())
+
+
+class LazyStats(object):
+    """
+    Stands in for Stats until they are used, keeping the profile page (compressed) to parse them from.
+
+    :param html: The profile page
+    :param parse: The parse_stats function of the engine that parsed the rest of the page
+    """
+    __slots__ = ('_page', '_parse')
+
+    def __init__(self, html, parse):
+        self._page = zlib.compress(html.encode() if isinstance(html, str) else html)
+        self._parse = parse
+
+    def load(self) -> Stats:
+        return Stats(self._parse(zlib.decompress(self._page).decode()))
+
+    def __repr__(self):
+        return '<LazyStats (not parsed)>'
+
+
+class Section(Mapping):
+    """A fixed set of fields, subclasses list them in FIELDS as (key, slot)"""
+    __slots__ = ()
+    FIELDS = ()
+
+    def __init__(self, data: dict):
+        for key, slot in self.FIELDS:
+            setattr(self, slot, data.get(key))
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, self._slots[key])
+        except KeyError:
+            raise KeyError(key)
+
+    def __iter__(self):
+        return (key for key, _ in self.FIELDS)
+
+    def __len__(self):
+        return len(self.FIELDS)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+    def __init_subclass__(cls):
+        cls._slots = dict(cls.FIELDS)
+
+
+class Gear(Section):
+    FIELDS = (('Weapon', 'weapon'), ('Necklace', 'necklace'), ('Earring', 'earring'), ('Ring', 'ring'),
+              ('Bracelet', 'bracelet'), ('Belt', 'belt'), ('Soul', 'soul'))
+    __slots__ = tuple(slot for _, slot in FIELDS)
+
+
+class Outfit(Section):
+    FIELDS = (('Clothes', 'clothes'), ('Head', 'head'), ('Face', 'face'), ('Adornment', 'adornment'))
+    __slots__ = tuple(slot for _, slot in FIELDS)
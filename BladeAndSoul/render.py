@@ -0,0 +1,154 @@
+"""
+Renderers for Character cards and rosters.
+
+The card layouts are format strings built once at import time, a card is one format call on the
+character's fields. Rendered cards are kept on the Character until it is refreshed, so rendering
+the same character again costs a dict lookup.
+
+    render.card(c, 'stats')                  # same as c.pretty_stats()
+    render.roster(characters)                # a table, split into pages of at most 2000 characters
+    render.cards(characters, 'gear')         # many cards, packed into as few pages as fit
+"""
+from .models import Gear, Outfit
+
+# Discord's message length limit
+LIMIT = 2000
+CARDS = ('profile', 'gear', 'stats', 'outfit')
+
+_GEAR = ('```\n{header}\n{divider}\nTotal HP {hp}    Attack Power {ap}\n{divider}\n'
+         'Soul Shield Attributes (Base + Fused + Set)\n{shield}\n{bonus}\n\n' +
+         ''.join('{0}: {{gear[{0}]}}\n'.format(k) for k in sorted(key for key, _ in Gear.FIELDS)) +
+         '{divider}\n```')
+_STATS = '\n'.join(['```ruby', '{header}', '{divider}', 'HP: {s[HP][Total]}',
+                    'Attack Power: {s[Attack Power][Total]}',
+                    'Piercing: {s[Piercing][Total]}',
+                    '+Defense Piercing: {s[Piercing][Defense Piercing]}',
+                    '+Block Piercing: {s[Piercing][Block Piercing]}',
+                    'Accuracy: {s[Accuracy][Total]} ({s[Accuracy][Hit Rate]})',
+                    'Critical Hit: {s[Critical Hit][Total]} ({s[Critical Hit][Critical Rate]})',
+                    'Critical Damage: {s[Critical Damage][Total]} ({s[Critical Damage][Increase Damage]})', '{divider}',
+                    'Defense: {s[Defense][Total]} ({s[Defense][Damage Reduction]})',
+                    'Evasion: {s[Evasion][Total]}',
+                    '+Evasion Rate: {s[Evasion][Evasion Rate]}',
+                    '+Counter Bonus: {s[Evasion][Counter Bonus]}',
+                    'Block: {s[Block][Total]}',
+                    '+Damage Reduction: {s[Block][Damage Reduction]}',
+                    '+Block Bonus: {s[Block][Block Bonus]}',
+                    '+Block Rate: {s[Block][Block Rate]}',
+                    'Health Regen (IN/OUT): {s[Health Regen][In Combat]}/{s[Health Regen][Out of Combat]}',
+                    'Recovery Rate: {s[Recovery][Total]}',
+                    '```'])
+_OUTFIT = ('```\n{name}\'s Outfit:\n' +
+           ''.join('{0}: {{outfit[{0}]}}\n'.format(k) for k in sorted(key for key, _ in Outfit.FIELDS)) + '```')
+
+
+def _header(c, comma: str) -> str:
+    if c.hm_level:
+        return '{} [{}{} Level {} Hongmoon Level {}]'.format(c.name, c.class_, comma, c.level, c.hm_level)
+    return '{} [{}{} Level {}]'.format(c.name, c.class_, comma, c.level)
+
+
+def _profile(c) -> str:
+    text = ['**Display Name:** {}'.format(c.account),
+            '**Character**: {} Level {}{}'.format(c.name, c.level,
+                                                   ' Hongmoon Level {}'.format(c.hm_level) if c.hm_level else ''),
+            '**Weapon**: {}'.format(c.gear.weapon),
+            '**Server:** {}'.format(c.server)]
+    if c.faction:
+        if c.faction == 'Cerulean Order':
+            text.append('**Faction:** Cerulean Order :blue_heart:')
+        else:
+            text.append('**Faction"** Crimson Legion :heart:')
+        text.append('**Faction Rank:** {}'.format(c.faction_rank))
+        if c.clan:
+            text.append('**Clan:** {}'.format(c.clan))
+    if len(c.other_characters):
+        text.append('**Other Characters:**\n [{}]'.format(', '.join(c.other_characters)))
+    text.append(c.picture)
+    return '\n'.join(text).strip()
+
+
+def _gear(c) -> str:
+    header = _header(c, '')
+    stats = c.stats
+    return _GEAR.format(header=header, divider='─' * len(header), hp=stats['HP']['Total'],
+                        ap=stats['Attack Power']['Total'], shield='\n'.join(c.soul_shield), bonus=c.set_bonus,
+                        gear=c.gear).strip()
+
+
+def _stats(c) -> str:
+    header = _header(c, ',')
+    return _STATS.format(header=header, divider='─' * len(header), s=c.stats)
+
+
+def _outfit(c) -> str:
+    return _OUTFIT.format(name=c.name, outfit=c.outfit)
+
+
+RENDERERS = {'profile': _profile, 'gear': _gear, 'stats': _stats, 'outfit': _outfit}
+
+
+def card(c, name: str) -> str:
+    """
+    A character's card ('profile', 'gear', 'stats' or 'outfit'), kept on the character until it is refreshed
+
+    :param c: A Character
+    """
+    rendered = c._rendered
+    if name not in rendered:
+        rendered[name] = RENDERERS[name](c)
+    return rendered[name]
+
+
+def paginate(blocks, limit: int=LIMIT, separator: str='\n') -> list:
+    """
+    Pack text blocks into as few pages of at most limit characters as keeps them in order
+
+    :raises ValueError: When a single block is longer than limit
+    """
+    pages = []
+    page = []
+    size = 0
+    for block in blocks:
+        if len(block) > limit:
+            raise ValueError('A block of {} characters does not fit in a page of {}'.format(len(block), limit))
+        if page and size + len(separator) + len(block) > limit:
+            pages.append(separator.join(page))
+            page, size = [], 0
+        size += len(block) + (len(separator) if page else 0)
+        page.append(block)
+    if page:
+        pages.append(separator.join(page))
+    return pages
+
+
+def cards(characters, name: str, limit: int=LIMIT) -> list:
+    """The card of every character, packed into pages of at most limit characters"""
+    return paginate((card(c, name) for c in characters), limit)
+
+
+def _level(c) -> str:
+    return '{} HM{}'.format(c.level, c.hm_level) if c.hm_level else str(c.level)
+
+# (title, value) of the roster columns
+COLUMNS = (('Name', lambda c: c.name), ('Class', lambda c: c.class_), ('Level', _level),
+           ('HP', lambda c: c.stats['HP']['Total']), ('AP', lambda c: c.stats['Attack Power']['Total']),
+           ('Crit', lambda c: c.stats['Critical Hit']['Critical Rate']),
+           ('Clan', lambda c: c.clan or ''))
+
+
+def roster(characters, columns=COLUMNS, limit: int=LIMIT) -> list:
+    """
+    A table with a row for each character, split into code blocks of at most limit characters
+    that each repeat the header.
+
+    :param columns: (title, function of a Character) for every column, see COLUMNS
+    """
+    rows = [[str(get(c)) for _, get in columns] for c in characters]
+    widths = [max([len(title)] + [len(row[i]) for row in rows]) for i, (title, _) in enumerate(columns)]
+    line = '  '.join('{{:<{}}}'.format(w) for w in widths)
+    head = '```\n{}\n{}'.format(line.format(*(title for title, _ in columns)).rstrip(), '-' * sum(widths, 2 * (len(widths) - 1)))
+    # each page is head, its rows and the closing ```
+    fixed = len(head) + len('\n```')
+    pages = paginate((line.format(*row).rstrip() for row in rows), limit - fixed - 1)
+    return ['{}\n{}\n```'.format(head, page) for page in pages] or ['{}\n```'.format(head)]
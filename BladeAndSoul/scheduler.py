@@ -0,0 +1,192 @@
+"""
+Rate limiting, retries and circuit breaking for requests to the NCSoft endpoints.
+
+A Scheduler is shared by every Client it is given to:
+
+    scheduler = Scheduler(rates={'profile': (5, 10)})
+    async with Client(scheduler=scheduler) as client:
+        ...
+
+Every endpoint ('profile', 'search', 'suggest', 'item_suggest', 'market') gets
+- a token bucket, refilled at rate requests per second up to burst. The rate is halved on failure and grows back
+  a little with every success, so it settles just under what the service accepts.
+- jittered exponential backoff, retrying when the service answers with its error page (ServiceUnavialable)
+  or garbage (InvalidData).
+- a circuit breaker. After failures failures in a row requests fail fast with CircuitOpen for reset seconds,
+  then one request is let through, then two at a time, four... until the breaker closes again.
+"""
+import asyncio
+import random
+import time
+
+from . import metrics
+from .errors import CharacterNotFound, CircuitOpen, InvalidData, ServiceUnavialable
+
+# (rate per second, burst) by endpoint
+RATES = {'profile': (5, 10), 'search': (5, 10), 'suggest': (10, 20), 'item_suggest': (10, 20), 'market': (10, 20)}
+
+
+class TokenBucket(object):
+    """
+    Allows rate acquires a second on average and up to burst at once.
+    The rate adapts between max_rate / 16 and max_rate with slow_down and speed_up.
+    """
+    def __init__(self, rate: float, burst: int):
+        self.max_rate = self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        """Wait for a token"""
+        async with self._lock:
+            self._refill()
+            if self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= 1
+
+    def slow_down(self):
+        self.rate = max(self.max_rate / 16, self.rate / 2)
+
+    def speed_up(self):
+        self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+
+
+class CircuitBreaker(object):
+    """
+    Opens after failures failures in a row, and lets requests through again reset seconds later.
+    While half open 1, 2, 4... requests may run at once, each success doubling it until it passes
+    ramp and the breaker closes, a failure opens it again.
+    """
+    def __init__(self, failures: int=5, reset: float=30, ramp: int=8):
+        self.threshold = failures
+        self.reset = reset
+        self.ramp = ramp
+        self.failures = 0
+        self.opened = None
+        self.allowed = None
+        self.running = 0
+
+    @property
+    def state(self) -> str:
+        if self.opened is None:
+            return 'closed'
+        if self.allowed is None:
+            return 'open'
+        return 'half-open'
+
+    def acquire(self) -> bool:
+        """Start a request, False if it should fail fast"""
+        if self.opened is not None:
+            if self.allowed is None:
+                if time.monotonic() - self.opened < self.reset:
+                    return False
+                self.allowed = 1
+            if self.running >= self.allowed:
+                return False
+        self.running += 1
+        return True
+
+    def release(self, success: bool=None):
+        """
+        Finish a request
+
+        :param success: None when the request failed for a reason that says nothing about the service
+        """
+        self.running -= 1
+        if success:
+            self.failures = 0
+            if self.allowed is not None:
+                self.allowed *= 2
+                if self.allowed > self.ramp:
+                    self.opened = self.allowed = None
+        elif success is not None:
+            self.failures += 1
+            if self.allowed is not None or self.failures >= self.threshold:
+                self.opened = time.monotonic()
+                self.allowed = None
+
+    def retry_after(self) -> float:
+        """Seconds until the breaker lets a request through again"""
+        if self.opened is None or self.allowed is not None:
+            return 0
+        return max(0, self.reset - (time.monotonic() - self.opened))
+
+
+class Scheduler(object):
+    """
+    :param rates: {endpoint: (rate per second, burst)}, merged into RATES. Other endpoints use default.
+    :param default: The (rate per second, burst) of endpoints not in rates.
+    :param retries: Times a failed request is retried.
+    :param backoff: The first retry waits up to this many seconds, doubling every retry.
+    :param max_backoff: The longest a retry waits.
+    :param failures: Failures in a row that open an endpoint's circuit breaker.
+    :param reset: Seconds an open breaker fails requests fast.
+    """
+    retry_on = (ServiceUnavialable, InvalidData)
+
+    def __init__(self, rates: dict=None, default: tuple=(5, 10), retries: int=3, backoff: float=0.5,
+                 max_backoff: float=30, failures: int=5, reset: float=30):
+        self.rates = dict(RATES, **(rates or {}))
+        self.default = default
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.failures = failures
+        self.reset = reset
+        self.buckets = {}
+        self.breakers = {}
+
+    def bucket(self, endpoint) -> TokenBucket:
+        if endpoint not in self.buckets:
+            self.buckets[endpoint] = TokenBucket(*self.rates.get(endpoint, self.default))
+        return self.buckets[endpoint]
+
+    def breaker(self, endpoint) -> CircuitBreaker:
+        if endpoint not in self.breakers:
+            self.breakers[endpoint] = CircuitBreaker(self.failures, self.reset)
+        return self.breakers[endpoint]
+
+    def delay(self, attempt: int) -> float:
+        """The time to wait before retry attempt (0 based), "full jitter" so retries spread out"""
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    async def run(self, endpoint, func):
+        """
+        Return await func(), rate limited and retried for endpoint
+
+        :raises CircuitOpen: When the endpoint's breaker is open
+        """
+        bucket = self.bucket(endpoint)
+        breaker = self.breaker(endpoint)
+        for attempt in range(self.retries + 1):
+            if not breaker.acquire():
+                metrics.count('fetch.rejected', endpoint=endpoint)
+                raise CircuitOpen('{} is unavailable, retry in {:.1f}s'.format(endpoint, breaker.retry_after()))
+            try:
+                await bucket.acquire()
+                result = await func()
+            except CharacterNotFound:
+                breaker.release(True)
+                raise
+            except self.retry_on as e:
+                breaker.release(False)
+                bucket.slow_down()
+                if attempt == self.retries:
+                    raise
+                metrics.count('fetch.retries', endpoint=endpoint, error=type(e).__name__)
+                await asyncio.sleep(self.delay(attempt))
+            except BaseException:
+                breaker.release(None)
+                raise
+            else:
+                breaker.release(True)
+                bucket.speed_up()
+                return result
@@ -0,0 +1,154 @@
+"""
+The Soul Shield dataset (data/SS.yml) and lookups matching a profile's Soul Shield to it.
+
+SS.yml is compiled once into data/SS.json, with the stats of every piece and set effect already
+read out and an index of which pieces carry each stat. Nothing is loaded until first used, and the
+JSON is compiled again (needing PyYAML) only when SS.yml no longer matches the hash stored in it. To share the loaded dataset with
+forked workers, call load() in the parent before forking.
+
+    python -m BladeAndSoul.soulshields   # recompile data/SS.json after editing SS.yml
+"""
+import hashlib
+import json
+import re
+from os import path
+
+DATA = path.join(path.split(path.abspath(__file__))[0], 'data')
+SOURCE = path.join(DATA, 'SS.yml')
+COMPILED = path.join(DATA, 'SS.json')
+# the stat names used in SS.yml to the names used on profiles
+STAT_NAMES = {'HP': 'HP', 'HP1': 'HP', 'HP2': 'HP', 'ACC': 'Accuracy', 'DEF': 'Defense', 'EVA': 'Evasion',
+              'BLK': 'Block', 'cRate': 'Critical', 'cDef': 'Critical Defense'}
+# "HP: 31750 (20700 + 7550 + 3500)" - total (base + fused + set)
+LINE = re.compile(r'^(.+?): (\d+) \((\d+)(?: \+ (\d+))?(?: \+ (\d+))?\)$')
+SET_BONUS = re.compile(r'^(.+?) Soul Shield\n(\d+) Set:', re.M)
+# "248 DEF" or "HP 15510"
+EFFECT = re.compile(r'(\d+) (\w+)|(\w+) (\d+)')
+
+_data = None
+
+
+def _effect_stats(text) -> dict:
+    r = {}
+    for a, b, c, d in EFFECT.findall(str(text)):
+        name, value = (b, a) if a else (c, d)
+        if name in STAT_NAMES:
+            r[STAT_NAMES[name]] = r.get(STAT_NAMES[name], 0) + int(value)
+    return r
+
+
+def _hash(source) -> str:
+    with open(source, 'rb') as f:
+        return hashlib.sha256(f.read().replace(b'\r\n', b'\n')).hexdigest()  # same after a CRLF checkout
+
+
+def compile(source=SOURCE, target=COMPILED) -> dict:
+    """Read SS.yml and write the compiled dataset to target (if it can), returning it"""
+    import yaml
+    with open(source) as f:
+        raw = yaml.safe_load(f)
+    sets = {}
+    index = {}
+    for name, pieces in raw.items():
+        effects = {str(k): str(v) for k, v in pieces.pop('Set Effect', {}).items()}
+        sets[name] = {'effects': effects,
+                      'effect_stats': {k.split()[0]: _effect_stats(v) for k, v in effects.items()},
+                      'pieces': {str(k): {k2: str(v2) for k2, v2 in v.items()} for k, v in pieces.items()}}
+        for piece, stats in sets[name]['pieces'].items():
+            names = {STAT_NAMES[k] for k in stats if k in STAT_NAMES}
+            for key in ('Main Name', 'Sub Name'):
+                names.update(STAT_NAMES[k] for k in stats.get(key, '').split(', ') if k in STAT_NAMES)
+            for stat in names:
+                index.setdefault(stat, []).append([name, piece])
+    data = {'sets': sets, 'index': {k: sorted(v) for k, v in index.items()}, 'source': _hash(source)}
+    try:
+        with open(target, 'w') as f:
+            json.dump(data, f, indent=1, sort_keys=True)
+    except OSError:
+        pass  # read only install, use it from memory
+    return data
+
+
+def load() -> dict:
+    """The compiled dataset, loaded on first use"""
+    global _data
+    if _data is None:
+        if path.exists(COMPILED):
+            with open(COMPILED) as f:
+                _data = json.load(f)
+        # mtimes say nothing after a checkout or install, the hash says whether SS.yml was edited
+        if _data is None or (path.exists(SOURCE) and _data.get('source') != _hash(SOURCE)):
+            _data = compile()
+    return _data
+
+
+def sets() -> list:
+    return list(load()['sets'])
+
+
+def piece(name, number) -> dict:
+    """The stats of piece number (1-8) of a set, as written in SS.yml"""
+    return load()['sets'][name]['pieces'][str(number)]
+
+
+def set_effect(name) -> dict:
+    """{'3 Set': text, ...} for a set"""
+    return load()['sets'][name]['effects']
+
+
+def pieces_with(stat) -> list:
+    """The (set, piece number) of every piece with stat (a profile stat name, e.g. 'Critical')"""
+    return [tuple(x) for x in load()['index'].get(stat, ())]
+
+
+def parse_lines(lines) -> dict:
+    """Read the SoulSheild lines of a profile into {stat: (total, base, fused, set)}"""
+    r = {}
+    for line in lines:
+        match = LINE.match(line)
+        if match is not None:
+            r[match.group(1)] = tuple(int(x or 0) for x in match.groups()[1:])
+    return r
+
+
+def match(soul_shield, set_bonus: str='') -> dict:
+    """
+    Match a profile's Soul Shield to the dataset
+
+    :param soul_shield: The SoulSheild lines of a profile
+    :param set_bonus: The Set Bonus text of the profile, naming the equipped sets
+    :return: {'sets': {set: highest active set effect (3, 5, 8)} for the known sets in set_bonus,
+              'stats': parse_lines(soul_shield),
+              'pieces': {stat: [(set, piece number)...]} the pieces that could give each stat,
+                        only from the equipped sets when any are known,
+              'set_stats': {stat: value} the stats the active set effects should add}
+    """
+    data = load()
+    active = {}
+    for name, count in SET_BONUS.findall(set_bonus or ''):
+        if name in data['sets']:
+            active[name] = max(active.get(name, 0), int(count))
+    stats = parse_lines(soul_shield)
+    pieces = {stat: [p for p in pieces_with(stat) if not active or p[0] in active] for stat in stats}
+    set_stats = {}
+    for name, count in active.items():
+        for tier, effect in data['sets'][name]['effect_stats'].items():
+            if int(tier) <= count:
+                for stat, value in effect.items():
+                    set_stats[stat] = set_stats.get(stat, 0) + value
+    return {'sets': active, 'stats': stats, 'pieces': pieces, 'set_stats': set_stats}
+
+
+def legacy() -> dict:
+    """The dataset as data.SouShields.SS has it, {set: {piece or 'Set Effect': 'sorted "key: value" lines'}}"""
+    r = {}
+    for name, s in load()['sets'].items():
+        r[name] = {'Set Effect': '\n'.join(sorted('{}: {}'.format(k, v) for k, v in s['effects'].items()))}
+        for number, stats in s['pieces'].items():
+            r[name][number] = '\n'.join(sorted('{}: {}'.format(k, v) for k, v in stats.items()))
+    return r
+
+
+if __name__ == '__main__':
+    compile()
+    print('compiled', SOURCE, 'to', COMPILED)
@@ -0,0 +1,39 @@
+"""
+The SQLite connection of the classes keeping their state in a file (SQLiteCache, ItemIndex, Crawler).
+"""
+import os
+import sqlite3
+
+
+class SQLiteStore(object):
+    """
+    Connects to path on first use, and again in every forked child (a connection can't be shared
+    across a fork, each process opens its own). A subclass lists the statements creating its
+    tables in SCHEMA, they are run on every new connection.
+
+    :param path: The database file, created if missing, kept in memory if None.
+    """
+    PRAGMAS = ('PRAGMA journal_mode=WAL',)
+    SCHEMA = ()
+
+    def __init__(self, path):
+        self.path = path
+        self._db = None
+        self._pid = None
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        if self._db is None or self._pid != os.getpid():
+            self._db = sqlite3.connect(self.path or ':memory:', timeout=30, isolation_level=None)
+            if self.path:
+                for pragma in self.PRAGMAS:
+                    self._db.execute(pragma)
+            for statement in self.SCHEMA:
+                self._db.execute(statement)
+            self._pid = os.getpid()
+        return self._db
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+        self._db = None
@@ -0,0 +1,94 @@
+"""
+Blocking versions of the main calls, for scripts and code without an event loop.
+
+Every call runs on one event loop in a background thread, with its default client, so connections
+and the cache are kept between calls. Anything else async can be run on it with run().
+
+    from BladeAndSoul import sync
+    yui = sync.character('Yui')
+    sync.run(yui.refresh())
+    for name, character in sync.iter_characters(['Yui', 'Fuzen']):
+        ...
+    sync.export(open('names.txt'), 'characters.jsonl', checkpoint='characters.ckpt')
+"""
+import asyncio
+import atexit
+import threading
+
+from . import bns, export as _export
+from .client import close as _close
+
+_loop = None
+_lock = threading.Lock()
+
+
+def loop() -> asyncio.AbstractEventLoop:
+    """The background event loop, started on first use"""
+    global _loop
+    with _lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name='BladeAndSoul', daemon=True).start()
+    return _loop
+
+
+def run(coro):
+    """Run a coroutine on the background loop and wait for its result, cancelling it if interrupted"""
+    future = asyncio.run_coroutine_threadsafe(coro, loop())
+    try:
+        return future.result()
+    except BaseException:
+        future.cancel()
+        raise
+
+
+def character(user, **kwargs) -> bns.Character:
+    """See bns.get_character"""
+    return run(bns.get_character(user, **kwargs))
+
+
+def characters(names, **kwargs) -> dict:
+    """See bns.get_characters"""
+    return run(bns.get_characters(names, **kwargs))
+
+
+def find_character(user, **kwargs):
+    """See bns.find_character"""
+    return run(bns.find_character(user, **kwargs))
+
+
+def search_item(item, **kwargs) -> list:
+    """See bns.search_item"""
+    return run(bns.search_item(item, **kwargs))
+
+
+def iter_characters(names, **kwargs):
+    """
+    See bns.iter_characters, the characters are fetched ahead in the background while this is iterated.
+    names is read on the background loop, use export for names streamed from a file or stdin.
+    """
+    results = bns.iter_characters(names, **kwargs)
+    try:
+        while True:
+            try:
+                yield run(results.__anext__())
+            except StopAsyncIteration:
+                return
+    finally:
+        run(results.aclose())
+
+
+def export(names, output, **kwargs) -> int:
+    """See export.export"""
+    return run(_export.export(names, output, **kwargs))
+
+
+@atexit.register
+def close():
+    """Close the default client of the background loop and stop it"""
+    global _loop
+    with _lock:
+        old, _loop = _loop, None
+    if old is not None:
+        asyncio.run_coroutine_threadsafe(_close(), old).result()
+        old.call_soon_threadsafe(old.stop)
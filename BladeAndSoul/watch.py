@@ -0,0 +1,187 @@
+"""
+Watch characters for changes.
+
+A Watcher polls every watched character on its own schedule and keeps a compact snapshot of
+the fields worth watching (level, HM level, faction, clan, gear and stat totals), with a hash of it.
+A poll whose hash matches the last one is done, only changed characters are diffed and reported.
+Characters that change often are polled more often (down to min_interval), quiet ones less
+(up to max_interval).
+
+    watcher = Watcher(client, min_interval=60)
+    watcher.watch(['Yui', 'Fuzen'])
+    async for event in watcher.changes():
+        for change in event.changes:
+            print(event.name, change.field, change.key, change.old, '->', change.new)
+"""
+import asyncio
+import hashlib
+import heapq
+import json
+import time
+from collections import namedtuple
+
+from .bns import fetch_profile
+from .client import Client
+
+# one difference, key is the gear slot or stat name (None for plain fields)
+Change = namedtuple('Change', 'field key old new')
+# the changes found in one poll of a character
+ChangeEvent = namedtuple('ChangeEvent', 'name profile changes time')
+
+# the plain fields watched
+FIELDS = ('Level', 'HM Level', 'Server', 'Faction', 'Faction Rank', 'Clan')
+
+
+def snapshot(profile) -> dict:
+    """The watched fields of a profile (a fetch_profile dict or Character), as {field: value or {key: value}}"""
+    r = {k: profile[k] for k in FIELDS}
+    r['Gear'] = dict(profile['Gear'])
+    r['Stats'] = {k: v.get('Total') for k, v in profile['Stats'].items()}
+    return r
+
+
+def digest(snap: dict) -> bytes:
+    return hashlib.blake2b(json.dumps(snap, sort_keys=True).encode(), digest_size=16).digest()
+
+
+def diff(old: dict, new: dict) -> list:
+    """The Changes between two snapshots"""
+    changes = []
+    for field in new:
+        a, b = old.get(field), new[field]
+        if a == b:
+            continue
+        if isinstance(b, dict):
+            a = a or {}
+            changes.extend(Change(field, key, a.get(key), b.get(key)) for key in sorted(a.keys() | b.keys(), key=str)
+                           if a.get(key) != b.get(key))
+        else:
+            changes.append(Change(field, None, a, b))
+    return changes
+
+
+class Watched(object):
+    """The state kept for a watched character"""
+    __slots__ = ('name', 'digest', 'snapshot', 'interval', 'due', 'polls', 'changed')
+
+    def __init__(self, name, interval):
+        self.name = name
+        self.digest = self.snapshot = None
+        self.interval = interval
+        self.due = 0
+        self.polls = self.changed = 0
+
+
+class Watcher(object):
+    """
+    :param client: The Client to fetch with, the shared default client is used if not given.
+        Profiles are fetched around the client's cache, so it never hides a change.
+    :param region: The region of the watched characters, the client's region if not given.
+    :param min_interval: The shortest time (in seconds) between two polls of a character.
+    :param max_interval: The longest time between two polls of a character.
+    :param concurrency: The maximum number of characters polled at once.
+    """
+    def __init__(self, client: Client=None, region: str=None, min_interval: float=60, max_interval: float=3600,
+                 concurrency: int=10):
+        self.client = client
+        self.region = region
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.concurrency = concurrency
+        self.watched = {}
+        self.errors = 0
+        self._heap = []
+        self._wake = None
+
+    def _schedule(self, state, due):
+        state.due = due
+        heapq.heappush(self._heap, (due, state.name))
+        if self._wake is not None:
+            self._wake.set()
+
+    def watch(self, names):
+        """Start watching names, they are polled right away"""
+        for name in names:
+            if name.lower() not in self.watched:
+                state = self.watched[name.lower()] = Watched(name, self.min_interval)
+                self._schedule(state, time.monotonic())
+
+    def unwatch(self, name):
+        self.watched.pop(name.lower(), None)
+
+    async def poll(self, name):
+        """Fetch a watched character now, returning a ChangeEvent if it changed since the last poll"""
+        state = self.watched[name.lower()]
+        profile = await fetch_profile(state.name, client=self.client, region=self.region, cached=False)
+        snap = snapshot(profile)
+        new = digest(snap)
+        state.polls += 1
+        event = None
+        if state.digest is not None and new != state.digest:
+            changes = diff(state.snapshot, snap)
+            if changes:
+                state.changed += 1
+                event = ChangeEvent(state.name, profile, changes, time.time())
+        state.interval = (max(self.min_interval, state.interval / 2) if event else
+                          min(self.max_interval, state.interval * 1.5))
+        state.digest, state.snapshot = new, snap
+        return event
+
+    async def changes(self):
+        """Poll the watched characters forever, yielding a ChangeEvent for each change found"""
+        events = asyncio.Queue()
+        semaphore = asyncio.Semaphore(self.concurrency)
+        self._wake = asyncio.Event()
+        running = set()
+
+        async def poll(state):
+            try:
+                event = await self.poll(state.name)
+            except Exception:
+                self.errors += 1
+                state.interval = min(self.max_interval, state.interval * 2)
+                event = None
+            finally:
+                semaphore.release()
+            if self.watched.get(state.name.lower()) is state:
+                self._schedule(state, time.monotonic() + state.interval)
+            if event is not None:
+                await events.put(event)
+
+        async def schedule():
+            while True:
+                now = time.monotonic()
+                if not self._heap or self._heap[0][0] > now:
+                    self._wake.clear()
+                    timeout = self._heap[0][0] - now if self._heap else None
+                    try:
+                        await asyncio.wait_for(self._wake.wait(), timeout)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                due, name = heapq.heappop(self._heap)
+                state = self.watched.get(name.lower())
+                if state is None or state.due != due:
+                    continue  # unwatched, or rescheduled since
+                await semaphore.acquire()
+                task = asyncio.ensure_future(poll(state))
+                running.add(task)
+                task.add_done_callback(running.discard)
+
+        scheduler = asyncio.ensure_future(schedule())
+        get = None
+        try:
+            while True:
+                get = asyncio.ensure_future(events.get())
+                await asyncio.wait([get, scheduler], return_when=asyncio.FIRST_COMPLETED)
+                if not get.done():
+                    get.cancel()
+                    scheduler.result()  # the scheduler failed, raise why
+                yield get.result()
+        finally:
+            if get is not None:
+                get.cancel()
+            scheduler.cancel()
+            for task in list(running):
+                task.cancel()
+            self._wake = None
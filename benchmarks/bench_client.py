@@ -0,0 +1,47 @@
+"""
+Latency per fetch_profile lookup with a new ClientSession per request (the old
+fetch_url behaviour) versus one shared, pooled Client.
+
+    python -m benchmarks.bench_client [lookups] [latency]
+"""
+import asyncio
+import sys
+import time
+
+import aiohttp
+
+from BladeAndSoul import Client
+from BladeAndSoul.bns import fetch_profile
+
+from .stub import StubServer
+
+
+class SessionPerRequest(Client):
+    """Opens and closes a session for every request, like fetch_url used to"""
+    async def get_text(self, url, params=None, endpoint=None) -> str:
+        async with aiohttp.ClientSession() as session:
+            async with session.get(url, params=params) as re:
+                return await re.text()
+
+
+async def run(client, lookups):
+    timings = []
+    async with client:
+        for _ in range(lookups):
+            start = time.perf_counter()
+            await fetch_profile('Yui', client=client)
+            timings.append(time.perf_counter() - start)
+    timings.sort()
+    return sum(timings) / len(timings), timings[len(timings) // 2]
+
+
+async def main(lookups=200, latency=0.0):
+    async with StubServer(latency=latency) as stub:
+        stub.patch()
+        for name, client in (('session per request', SessionPerRequest()), ('pooled client', Client())):
+            mean, p50 = await run(client, lookups)
+            print('{:<20} mean {:7.2f} ms   p50 {:7.2f} ms'.format(name, mean * 1000, p50 * 1000))
+
+
+if __name__ == '__main__':
+    asyncio.get_event_loop().run_until_complete(main(*[f(x) for f, x in zip((int, float), sys.argv[1:])]))
@@ -0,0 +1,64 @@
+"""
+Parses per second and peak memory per parse of each profile parse engine over the saved fixtures.
+Every engine runs in its own process, the peak is what tracemalloc saw allocated during one parse
+(Python objects only, memory lxml allocates in C for its trees is not counted).
+
+    python -m benchmarks.bench_parse [seconds per engine]
+"""
+import multiprocessing
+import sys
+import time
+import tracemalloc
+
+from BladeAndSoul import bns
+
+from .stub import fixture
+
+PAGES = [fixture(name) for name in ('profile.html', 'profile_nofaction.html')]
+ENGINES = [('soup', 'lxml'), ('soup', 'html.parser'), ('lxml', None)]
+
+
+def measure(engine, parser, seconds, queue):
+    bns.engine = engine
+    if parser:
+        bns.parser = parser
+    parse = bns._engine()[1]
+    count = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        for page in PAGES:
+            parse(page, [])
+        count += len(PAGES)
+    elapsed = time.perf_counter() - start
+    # traced separately, tracing slows the timed loop down
+    tracemalloc.start()
+    peak = 0
+    for page in PAGES:
+        tracemalloc.reset_peak()
+        current = tracemalloc.get_traced_memory()[0]
+        parse(page, [])
+        peak = max(peak, tracemalloc.get_traced_memory()[1] - current)
+    tracemalloc.stop()
+    queue.put((count / elapsed, peak / 1024))
+
+
+def main(seconds=3.0):
+    default = bns.parser
+    expected = [bns.parse_profile(page, []) for page in PAGES]
+    for engine, parser in ENGINES:
+        bns.engine, bns.parser = engine, parser or default
+        assert [bns._engine()[1](page, []) for page in PAGES] == expected, engine
+    bns.engine, bns.parser = 'soup', default
+    ctx = multiprocessing.get_context('spawn')
+    for engine, parser in ENGINES:
+        queue = ctx.Queue()
+        p = ctx.Process(target=measure, args=(engine, parser, seconds, queue))
+        p.start()
+        rate, peak = queue.get()
+        p.join()
+        name = engine if parser is None else '{} ({})'.format(engine, parser)
+        print('{:<20} {:8.1f} parses/s   peak {:6.0f} KiB/parse'.format(name, rate, peak))
+
+
+if __name__ == '__main__':
+    main(*map(float, sys.argv[1:]))
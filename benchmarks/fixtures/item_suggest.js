@@ -0,0 +1,2 @@
+
+suggestKeyword({"result": "0", "front": [["Moonstone", 0], ["Moonstone Crystal", 0], ["Moonstone Vial", 0], ["moon", 1]], "back": []});
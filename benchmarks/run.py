@@ -0,0 +1,156 @@
+"""
+The offline benchmark suite.
+
+Runs every benchmark against the stub server and reports throughput, p50/p99 latency, and per
+operation the peak memory allocated and the memory blocks left allocated.
+Results can be saved and compared across commits.
+
+    python -m benchmarks.run                      # run and print
+    python -m benchmarks.run --save               # also save to benchmarks/results/<commit>.json
+    python -m benchmarks.run --compare OLD.json   # print the change against saved results
+    python -m benchmarks.run --only pretty        # only benchmarks whose name contains "pretty"
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from BladeAndSoul import Client, bns, render
+from BladeAndSoul.bns import Character, avg_dmg, fetch_profile, search_item, search_user
+
+from .stub import StubServer, fixture
+
+RESULTS = os.path.join(os.path.split(os.path.abspath(__file__))[0], 'results')
+
+
+def _benchmarks(client, memo_client):
+    """(name, function, is coroutine) for every benchmark"""
+    character = Character(bns.parse_profile(fixture('profile.html'), ['Yuiko', 'Yuna', 'Mirei']))
+    stats = character['Stats']
+    roster = [Character(dict(character.to_dict(), **{'Character Name': 'Yui{}'.format(i)})) for i in range(100)]
+
+    def engine(name, func):
+        async def run():
+            bns.engine = name
+            try:
+                return await func()
+            finally:
+                bns.engine = 'soup'
+        return run
+
+    return [
+        ('fetch_profile[soup]', engine('soup', lambda: fetch_profile('Yui', client=client)), True),
+        ('fetch_profile[lxml]', engine('lxml', lambda: fetch_profile('Yui', client=client)), True),
+        ('fetch_profile[memo]', lambda: fetch_profile('Yui', client=memo_client), True),
+        ('search_user', lambda: search_user('Yui', client=client), True),
+        ('search_item', lambda: search_item('Moonstone', display=3, client=client), True),
+        ('avg_dmg', lambda: avg_dmg(stats['Attack Power']['Total'], stats['Critical Hit']['Critical Rate'],
+                                    stats['Critical Damage']['Total']), False),
+        ('Character.avg_dmg', character.avg_dmg, False),
+        ('Character.pretty_profile', character.pretty_profile, False),
+        ('Character.pretty_gear', character.pretty_gear, False),
+        ('Character.pretty_stats', character.pretty_stats, False),
+        ('Character.pretty_outfit', character.pretty_outfit, False),
+        # the pretty_* benchmarks above hit the rendered card kept on the character, these render every time
+        ('render.profile[uncached]', lambda: render.RENDERERS['profile'](character), False),
+        ('render.gear[uncached]', lambda: render.RENDERERS['gear'](character), False),
+        ('render.stats[uncached]', lambda: render.RENDERERS['stats'](character), False),
+        ('render.outfit[uncached]', lambda: render.RENDERERS['outfit'](character), False),
+        ('render.roster[100]', lambda: render.roster(roster), False),
+    ]
+
+
+async def _measure(func, is_coroutine, seconds):
+    timings = []
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline or len(timings) < 5:
+        start = time.perf_counter()
+        if is_coroutine:
+            await func()
+        else:
+            func()
+        timings.append(time.perf_counter() - start)
+    # memory is traced in a separate pass, tracing slows everything down
+    runs = max(1, min(len(timings), 50))
+    peak = 0
+    tracemalloc.start()
+    blocks = sys.getallocatedblocks()
+    for _ in range(runs):
+        tracemalloc.reset_peak()
+        current = tracemalloc.get_traced_memory()[0]
+        if is_coroutine:
+            await func()
+        else:
+            func()
+        peak += tracemalloc.get_traced_memory()[1] - current
+    retained = sys.getallocatedblocks() - blocks
+    tracemalloc.stop()
+    timings.sort()
+    return {'runs': len(timings),
+            'ops_per_sec': len(timings) / sum(timings),
+            'p50_ms': timings[len(timings) // 2] * 1000,
+            'p99_ms': timings[min(len(timings) - 1, int(len(timings) * 0.99))] * 1000,
+            'peak_kib': peak / runs / 1024,
+            'retained_blocks': retained / runs}
+
+
+async def run(seconds=1.0, only=None, latency=0.0) -> dict:
+    results = {}
+    async with StubServer(latency=latency) as stub:
+        stub.patch()
+        # pages are parsed every time, except by memo_client which skips pages it parsed before
+        async with Client(memo=0) as client, Client() as memo_client:
+            for name, func, is_coroutine in _benchmarks(client, memo_client):
+                if only and only not in name:
+                    continue
+                results[name] = await _measure(func, is_coroutine, seconds)
+                print_result(name, results[name])
+    return results
+
+
+def print_result(name, r, old=None):
+    line = '{:<26} {:>10.1f} ops/s  p50 {:>8.3f} ms  p99 {:>8.3f} ms  peak {:>8.1f} KiB  retained {:>6.1f} blocks'.format(
+        name, r['ops_per_sec'], r['p50_ms'], r['p99_ms'], r['peak_kib'], r['retained_blocks'])
+    if old is not None:
+        line += '  ({:+.1f}% ops/s)'.format((r['ops_per_sec'] / old['ops_per_sec'] - 1) * 100)
+    print(line)
+
+
+def commit() -> str:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def main():
+    args = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    args.add_argument('--seconds', type=float, default=1.0, help='time spent on each benchmark')
+    args.add_argument('--latency', type=float, default=0.0, help='stub server latency in seconds')
+    args.add_argument('--only', help='only run benchmarks whose name contains this')
+    args.add_argument('--save', action='store_true', help='save the results to benchmarks/results/<commit>.json')
+    args.add_argument('--compare', help='a saved results file to compare against')
+    args = args.parse_args()
+
+    results = asyncio.get_event_loop().run_until_complete(run(args.seconds, args.only, args.latency))
+    if args.compare:
+        with open(args.compare) as f:
+            old = json.load(f)['results']
+        print('\ncompared to', args.compare)
+        for name, r in results.items():
+            print_result(name, r, old.get(name))
+    if args.save:
+        os.makedirs(RESULTS, exist_ok=True)
+        path = os.path.join(RESULTS, commit() + '.json')
+        with open(path, 'w') as f:
+            json.dump({'commit': commit(), 'time': time.time(), 'seconds': args.seconds, 'latency': args.latency,
+                       'results': results}, f, indent=1)
+        print('saved to', path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""
+A local stub of the NCSoft and market endpoints serving the recorded responses in fixtures/.
+
+Usage:
+    async with StubServer(latency=0.05, error_rate=0.1) as stub:
+        stub.patch()  # point BladeAndSoul at the stub until it stops
+        ...
+"""
+import asyncio
+import hashlib
+import json
+import random
+from os import path
+
+from aiohttp import web
+
+from BladeAndSoul import bns
+
+FIXTURES = path.join(path.split(path.abspath(__file__))[0], 'fixtures')
+# the bns endpoints and the stub route serving each, every region gets its own prefix (/na/profile, /eu/profile...)
+ENDPOINTS = {'PROFILE_URL': '/profile', 'SEARCH_URL': '/search', 'SUGGEST_URL': '/suggest',
+             'ITEM_NAME_SUGGEST': '/itemsuggest', 'MARKET_API_ENDPOINT': '/market'}
+
+
+def fixture(name) -> str:
+    with open(path.join(FIXTURES, name), encoding='utf-8', newline='') as f:
+        return f.read()
+
+
+class StubServer(object):
+    """
+    Serves the recorded responses on localhost.
+    Names added to missing get an empty search page in every region, (region, name) only in that region.
+
+    :param latency: Seconds to wait before answering each request.
+    :param error_rate: The share of requests answered with an error, the service error page for
+        profiles and searches and garbage for the market.
+    :param seed: Seed for picking which requests fail.
+    :param etag: Send an ETag with pages and answer 304 Not Modified when it matches If-None-Match.
+    """
+    def __init__(self, host='127.0.0.1', port=0, latency: float=0, error_rate: float=0, seed=None, etag: bool=False):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.etag = etag
+        self.not_modified = 0
+        self.requests = 0
+        self.errors = 0
+        self.missing = set()
+        self.pages = {'/profile': fixture('profile.html'), '/search': fixture('search.html'),
+                      '/itemsuggest': fixture('item_suggest.js'), '/market': fixture('market.json')}
+        self.error_page = fixture('error.html')
+        self.users = json.loads(fixture('suggest.json'))
+        self._runner = None
+        self._patched = None
+
+    async def handle(self, request):
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        region, route = request.path.split('/')[1:3]
+        route = '/' + route
+        if self.error_rate and self.random.random() < self.error_rate:
+            self.errors += 1
+            if route == '/market':
+                return web.Response(text='<html>Bad Gateway</html>', status=502, content_type='text/html')
+            return web.Response(text=self.error_page, content_type='text/html')
+        if route == '/suggest':
+            query = request.query.get('query', '').lower()
+            front = [x for x in self.users['front'] if x[0].lower().startswith(query)]
+            data = dict(self.users, front=front[:int(request.query.get('display', 10))])
+            return web.Response(text=json.dumps(data), content_type='application/json')
+        name = request.query.get('c')
+        if name in self.missing or (region.upper(), name) in self.missing:
+            return web.Response(text='<div class="searchList"><ul></ul></div>', content_type='text/html')
+        page = self.pages[route]
+        if self.etag:
+            etag = '"{}"'.format(hashlib.md5(page.encode()).hexdigest())
+            if request.headers.get('If-None-Match') == etag:
+                self.not_modified += 1
+                return web.Response(status=304, headers={'ETag': etag})
+            return web.Response(text=page, content_type='text/html', headers={'ETag': etag})
+        return web.Response(text=page, content_type='text/html')
+
+    @property
+    def url(self) -> str:
+        return 'http://{}:{}'.format(self.host, self.port)
+
+    def patch(self):
+        """Point the BladeAndSoul endpoints of every region at this server, until it stops"""
+        if self._patched is None:
+            self._patched = {region: dict(urls) for region, urls in bns.REGIONS.items()}
+        for region, urls in bns.REGIONS.items():
+            for k, route in ENDPOINTS.items():
+                urls[k] = '{}/{}{}'.format(self.url, region.lower(), route)
+
+    async def start(self):
+        app = web.Application()
+        for route in ENDPOINTS.values():
+            app.router.add_get('/{region}' + route, self.handle)
+        app.router.add_get('/{region}/market/{item}/true', self.handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        if self._patched is not None:
+            for region, urls in self._patched.items():
+                bns.REGIONS[region].update(urls)
+            self._patched = None
+        await self._runner.cleanup()
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *args):
+        await self.stop()
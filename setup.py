@@ -19,5 +19,6 @@ setup(
         ],
     keywords='Unofficial BladeAndSoul API',
     install_requires=['aiohttp', 'bs4', 'lxml', 'PyYaml'],
+    extras_require={'history': ['numpy'], 'matrix': ['numpy'], 'brotli': ['Brotli'], 'parquet': ['pyarrow']},
     zip_safe=False
 )
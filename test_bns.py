@@ -2,6 +2,18 @@ import asyncio; loop = asyncio.get_event_loop()
 from time import sleep
 from BladeAndSoul import character
 from BladeAndSoul.errors import CharacterNotFound, ServiceUnavialable
+from contextlib import asynccontextmanager
+
+@asynccontextmanager
+async def stubbed(stub: dict=None, **kwargs):
+    """A patched benchmarks.stub.StubServer (with the stub kwargs) and a Client (with kwargs) to fetch from it"""
+    from BladeAndSoul import Client
+    from benchmarks.stub import StubServer
+    async with StubServer(**(stub or {})) as server:
+        server.patch()
+        async with Client(**kwargs) as client:
+            yield server, client
+
 async def func(name):
     c = await character(name)
     assert isinstance(c.Stats, dict)
@@ -20,3 +32,520 @@ def test_mytest():
             loop.run_until_complete(func('Joe'))
         except ServiceUnavialable:
             pass
+
+def test_characters():
+    from BladeAndSoul import Character, characters
+
+    async def func():
+        async with stubbed() as (stub, client):
+            stub.missing.add('Nobody')
+            return await characters(['Yui', 'Nobody', 'Yuii'], concurrency=2, client=client)
+    results = loop.run_until_complete(func())
+    assert list(results) == ['Yui', 'Nobody', 'Yuii']
+    assert isinstance(results['Yui'], Character)
+    assert results['Yui'].Stats['HP']['Total'] == '141620'
+    assert isinstance(results['Nobody'], CharacterNotFound)
+
+def test_cache():
+    from BladeAndSoul.bns import fetch_profile
+    from BladeAndSoul.cache import LRUCache
+
+    async def func():
+        async with stubbed(cache=LRUCache(maxsize=1)) as (stub, client):
+            profiles = await asyncio.gather(*[fetch_profile('Yui', client=client) for _ in range(50)])
+            assert stub.requests == 2  # one search, one profile
+            await fetch_profile('yui', client=client)
+            assert stub.requests == 2
+            return profiles, client.cache.stats()
+    profiles, stats = loop.run_until_complete(func())
+    assert all(p is profiles[0] for p in profiles)
+    assert stats['misses'] == 2 and stats['coalesced'] == 49 and stats['hits'] == 1
+    assert stats['evictions'] == 1 and stats['size'] == 1
+
+def test_default_client():
+    from BladeAndSoul import sync
+    from BladeAndSoul.client import close, default_client
+
+    async def get():
+        return default_client()
+    mine = loop.run_until_complete(get())
+    background = sync.run(get())
+    assert mine is not background and loop.run_until_complete(get()) is mine and sync.run(get()) is background
+    loop.run_until_complete(close())
+    assert loop.run_until_complete(get()) is not mine and sync.run(get()) is background
+
+    async def use():
+        client = default_client()
+        await client.open()
+        return client
+    from BladeAndSoul import client as module
+    before = len(module._defaults)
+    clients = [asyncio.run(use()) for _ in range(5)]  # each closed when its asyncio.run finished
+    asyncio.set_event_loop(loop)  # asyncio.run left no current loop
+    assert len(module._defaults) == before and all(c.closed for c in clients)
+    loop.run_until_complete(close())
+
+def test_sqlite_cache(tmpdir):
+    from BladeAndSoul.cache import SQLiteCache
+    path = str(tmpdir.join('cache.db'))
+    cache = SQLiteCache(path, max_bytes=200)
+    cache.set('profile:yui', {'Character Name': 'Yui', 'SoulSheild': ()})
+    cache.close()
+
+    cache = SQLiteCache(path, max_bytes=200)  # a restarted worker
+    async def func():
+        return await cache.fetch('profile:yui', None)
+    assert loop.run_until_complete(func()) == {'Character Name': 'Yui', 'SoulSheild': ()}
+    cache.set('big', 'x' * 150)
+    assert cache.get('profile:yui') is None and cache.get('big') == 'x' * 150
+    assert cache.stats()['evictions'] == 1
+    cache.set('old', 'x' * 20, ttl=-1)
+    cache.set('new', 'x' * 20)
+    cache.set('big', 'x' * 120)  # replaced, then over max_bytes with the expired entry, which goes first
+    assert cache.get('new') == 'x' * 20 and cache.get('big') == 'x' * 120 and len(cache) == 2
+    accessed = 'SELECT accessed FROM cache WHERE key = ?'
+    last = cache.db.execute(accessed, ('new',)).fetchone()[0]
+    cache.get('new')
+    assert cache.db.execute(accessed, ('new',)).fetchone()[0] == last  # used moments ago, not written again
+    cache.db.execute('UPDATE cache SET accessed = ? WHERE key = ?', (last - cache.touch - 1, 'new'))
+    cache.get('new')
+    assert cache.db.execute(accessed, ('new',)).fetchone()[0] > last - cache.touch - 1
+    cache.delete('new')
+    assert cache.db.execute('SELECT total FROM meta').fetchone()[0] == \
+        cache.db.execute('SELECT TOTAL(size) FROM cache').fetchone()[0]
+
+def test_engines():
+    from BladeAndSoul import bns, fastparse
+    from benchmarks.stub import fixture
+    for name in ('profile.html', 'profile_nofaction.html'):
+        page = fixture(name)
+        assert fastparse.parse_profile(page, ['Yuna']) == bns.parse_profile(page, ['Yuna'])
+    page = fixture('search.html')
+    assert fastparse.parse_search(page) == bns.parse_search(page) == [('Yui', ['Yuiko', 'Yuna', 'Mirei']),
+                                                                      ('Yuii', ['Yuiii'])]
+
+def test_executor():
+    from concurrent.futures import ProcessPoolExecutor
+    from BladeAndSoul.bns import fetch_profile
+
+    async def func(executor):
+        async with stubbed(executor=executor) as (stub, client):
+            return await fetch_profile('Yui', client=client)
+    with ProcessPoolExecutor(2) as executor:
+        assert loop.run_until_complete(func(executor)) == loop.run_until_complete(func(None))
+
+def test_price_parse():
+    from BladeAndSoul.bns import price_parse, split_price, parse_market
+    htmls = ['<span class="gold">12 <img src="gold.png"></span><span class="silver">3 <img></span>'
+             '<span class="bronze">45 <img></span>',
+             '<span class="silver">99<img></span>',
+             '<span class="gold">1,024</span>']
+    assert price_parse(htmls) == [120345, 9900, 10240000]
+    assert split_price(120345) == (12, 3, 45)
+    text = '[{"iconImg": "/a.png", "price_html": "<span class=\\"bronze\\">7</span>", "sale_data": {"amount": "5"}}]'
+    assert parse_market(text, 'Moonstone')['prices'] == [(7, 5)]
+    assert list(parse_market(text, 'Moonstone', compact=True)['amounts']) == [5]
+
+def test_market_history(tmpdir):
+    from BladeAndSoul.history import MarketHistory
+    history = MarketHistory(str(tmpdir))
+    assert history.record([{'name': 'Moonstone', 'icon': '', 'prices': [(300, 10), (100, 1), (200, 5)]}], 0) == 3
+    assert history.record([{'name': 'Moonstone', 'icon': '', 'prices': [(300, 10), (100, 1), (150, 2)]}], 30) == 1
+    history = MarketHistory(str(tmpdir))  # reopened
+    assert history.record([{'name': 'Moonstone', 'icon': '', 'prices': [(300, 10), (150, 2)]}], 60) == 0
+    assert history.record([{'name': 'Moonstone', 'icon': '', 'prices': [(400, 1)]}], 3600) == 1
+    summary = history.summary('Moonstone', end=3600)
+    assert summary['min'] == 100 and summary['median'] == 175 and summary['volume'] == 18
+    buckets = history.buckets('Moonstone', 3600)
+    assert list(buckets['start']) == [0, 3600] and list(buckets['min']) == [100, 400]
+    assert list(buckets['median']) == [175, 400] and buckets['vwap'][0] == (3000 + 100 + 1000 + 300) / 18
+    assert history.summary('Nothing') is None
+
+    from array import array
+    for column, code in (('item', 'i'), ('time', 'd')):  # a writer died between column appends
+        with open(str(tmpdir.join(column + '.bin')), 'ab') as f:
+            array(code, [0]).tofile(f)
+    history = MarketHistory(str(tmpdir))
+    assert len(history) == 5
+    assert history.record([{'name': 'Moonstone', 'icon': '', 'prices': [(500, 1)]}], 7200) == 1
+    assert len(history) == 6 and history.listings('Moonstone', start=7200)[0].tolist() == [7200]
+    assert all(tmpdir.join(k + '.bin').size() == 6 * size for k, size in (('item', 4), ('time', 8), ('price', 8)))
+
+def test_character_model():
+    from BladeAndSoul import bns, Character
+    from benchmarks.stub import fixture
+    page = fixture('profile.html')
+    data = bns.parse_profile(page, ['Yuna'])
+    c = Character(data)
+    assert isinstance(c.Stats, dict) and c.Stats == data['Stats'] and c.to_dict() == data
+    assert c.stats['Critical Hit']['Critical Rate'] == '45.30%'
+    assert c.stats['Critical Hit'].value('Critical Rate') == 45.3 and c.stats['HP'].value('Total') == 141620
+    assert c.character_name == c['character name'] == c['Character Name'] == 'Yui'
+    lazy = Character(bns.parse_profile(page, ['Yuna'], lazy=True), lazy=True)
+    assert isinstance(lazy._stats, bns.LazyStats)
+    assert lazy.pretty_stats() == c.pretty_stats()
+    assert lazy.Stats == data['Stats']
+
+def test_stat_matrix():
+    from BladeAndSoul import bns, Character
+    from BladeAndSoul.matrix import StatMatrix
+    from benchmarks.stub import fixture
+    characters = [Character(bns.parse_profile(fixture(name), [])) for name in ('profile.html', 'profile_nofaction.html')]
+    before = [c.to_dict() for c in characters]
+    matrix = StatMatrix(characters)
+    normal, buffed = matrix.avg_dmg()
+    assert (normal[0], buffed[0]) == characters[0].avg_dmg()
+    assert matrix.diff('Yui', 'Yuii')[('HP', 'Total')] == 0
+    assert matrix.diff_all('Yui').shape == (2, len(matrix.columns))
+    assert matrix.pairwise('Attack Power').tolist() == [[0, 0], [0, 0]]
+    assert matrix.top(1, ('Critical Hit', 'Critical Rate')) == [('Yui', 45.3)]
+    assert [c.to_dict() for c in characters] == before
+
+def test_search_item():
+    from BladeAndSoul.bns import search_item
+    from BladeAndSoul.errors import InvalidData
+
+    async def func(error_rate):
+        async with stubbed(stub={'error_rate': error_rate}) as (stub, client):
+            return await search_item('Moonstone', display=3, client=client)
+    items = loop.run_until_complete(func(0))
+    assert [x['name'] for x in items] == ['Moonstone', 'Moonstone Crystal', 'Moonstone Vial']
+    assert len(items[0]['prices']) == 30 and all(price > 0 and amount > 0 for price, amount in items[0]['prices'])
+    try:
+        loop.run_until_complete(func(1))
+    except (InvalidData, ServiceUnavialable):
+        pass
+    else:
+        assert False, 'the stub should have failed every request'
+
+def test_metrics():
+    from BladeAndSoul import metrics
+    from BladeAndSoul.bns import fetch_profile, get_item_data
+    from BladeAndSoul.cache import LRUCache
+    from BladeAndSoul.errors import InvalidData
+    from BladeAndSoul.scheduler import Scheduler
+
+    async def func():
+        async with stubbed(cache=LRUCache()) as (stub, client):
+            c = await fetch_profile('Yui', client=client)
+            await fetch_profile('Yui', client=client)
+            return c
+    recorder = metrics.use(metrics.Recorder())
+    try:
+        from BladeAndSoul import Character
+        Character(loop.run_until_complete(func())).pretty_gear()
+    finally:
+        metrics.use(None)
+    summary = recorder.summary()
+    assert summary['fetch']['count'] == 2 and recorder.total('fetch.bytes', endpoint='profile') > 0
+    assert summary['parse']['count'] == summary['parse.tree']['count'] == summary['parse.extract']['count'] == 2
+    assert summary['render']['count'] == 1
+    assert recorder.total('cache.miss') == 2 and recorder.total('cache.hit') == 1
+
+    async def failing():
+        async with stubbed(stub={'error_rate': 1}) as (stub, client):
+            for call in (fetch_profile('Yui', client=client), get_item_data('Moonstone', client)):
+                try:
+                    await call
+                except (ServiceUnavialable, InvalidData):
+                    pass
+        async with stubbed(stub={'error_rate': 0.5, 'seed': 1}, scheduler=Scheduler(backoff=0.001)) as (stub, client):
+            await fetch_profile('Yui', client=client)
+    recorder = metrics.use(metrics.Recorder())
+    try:
+        loop.run_until_complete(failing())
+    finally:
+        metrics.use(None)
+    assert recorder.total('fetch.errors', endpoint='search', error='ServiceUnavialable') == 1
+    assert recorder.total('parse.errors', error='ServiceUnavialable') >= 1
+    assert recorder.total('fetch.errors', endpoint='market', error='InvalidData') == 1
+    assert recorder.total('fetch.retries', error='ServiceUnavialable') >= 1
+
+def test_scheduler():
+    from BladeAndSoul.bns import fetch_profile
+    from BladeAndSoul.errors import CircuitOpen
+    from BladeAndSoul.scheduler import CircuitBreaker, Scheduler
+
+    async def func(error_rate, scheduler):
+        async with stubbed(stub={'error_rate': error_rate, 'seed': 1}, scheduler=scheduler) as (stub, client):
+            try:
+                return await fetch_profile('Yui', client=client), stub
+            except ServiceUnavialable as e:
+                return e, stub
+    profile, stub = loop.run_until_complete(func(0.5, Scheduler(retries=10, backoff=0.001, failures=20)))
+    assert profile['Character Name'] == 'Yui' and stub.errors > 0
+    error, stub = loop.run_until_complete(func(1, Scheduler(retries=10, backoff=0.001, failures=3)))
+    assert isinstance(error, CircuitOpen) and stub.requests == 3
+
+    breaker = CircuitBreaker(failures=1, reset=0, ramp=2)
+    assert breaker.acquire()
+    breaker.release(False)
+    assert breaker.state == 'open'
+    assert breaker.acquire() and not breaker.acquire()  # one at a time while half open
+    breaker.release(True)
+    assert breaker.acquire() and breaker.acquire() and not breaker.acquire()
+    breaker.release(True)
+    breaker.release(True)
+    assert breaker.state == 'closed'
+
+def test_regions():
+    from BladeAndSoul import find_character
+    from BladeAndSoul.bns import fetch_profile
+    from BladeAndSoul.cache import LRUCache
+
+    async def func():
+        async with stubbed(cache=LRUCache()) as (stub, client):
+            stub.missing.update([('NA', 'Yui'), 'Nobody'])
+            found = await find_character('Yui', client=client)
+            everywhere = await find_character('Yui', first=False, client=client)
+            try:
+                await fetch_profile('Yui', client=client)
+            except CharacterNotFound:
+                pass
+            else:
+                assert False, 'Yui is not in NA'
+            try:
+                await find_character('Nobody', client=client)
+            except CharacterNotFound:
+                pass
+            else:
+                assert False
+            return found, everywhere
+    found, everywhere = loop.run_until_complete(func())
+    assert found.Region == 'EU' and list(everywhere) == ['EU']
+
+def test_crawler(tmpdir):
+    from BladeAndSoul.crawler import BloomFilter, Crawler
+    path = str(tmpdir.join('crawl.db'))
+
+    async def func(seeds, limit=None, **kwargs):
+        async with stubbed() as (stub, client):
+            crawler = Crawler(path, client=client, concurrency=3, **kwargs)
+            try:
+                return await crawler.run(seeds, limit=limit), crawler
+            finally:
+                crawler.close()
+    assert loop.run_until_complete(func(['Yui'], limit=0))[0] == 0
+    fetched, crawler = loop.run_until_complete(func([]))  # resumed from the frontier
+    assert fetched == 1 and len(crawler) == 1 and crawler.frontier() == []
+    assert [p['Character Name'] for p in crawler.profiles()] == ['Yui']
+    assert crawler.missing >= 3  # the stub's search answers Yui for every name
+    fetched, crawler = loop.run_until_complete(func(['Yui']))
+    assert fetched == 0 and crawler.skipped > 0
+    assert loop.run_until_complete(func(['Yui'], max_age=0))[0] == 1
+
+    bloom = BloomFilter(1000)
+    for i in range(1000):
+        bloom.add(str(i))
+    assert all(str(i) in bloom for i in range(1000))
+    assert sum(str(i) in bloom for i in range(1000, 11000)) < 50
+
+def test_autocomplete():
+    from BladeAndSoul.autocomplete import Autocomplete, NameIndex
+
+    async def func():
+        async with stubbed() as (stub, client):
+            names = Autocomplete(client, display=6, debounce=0.01)
+            # "Y" then "Yu" typed quickly, only "Yu" is looked up
+            typed = await asyncio.gather(names.suggest('Y', session=1), names.suggest('Yu', session=1))
+            requests = stub.requests
+            assert await names.suggest('yui') == ['Yui', 'Yuii', 'Yuiko']
+            assert await names.suggest('Yuik') == ['Yuiko']
+            assert await names.suggest('Yu') == typed[1]
+            assert stub.requests == requests and names.local == 3
+            assert await names.suggest('M') == ['Mirei', 'Mireille']
+            # two callers without a session don't replace each other
+            names = Autocomplete(client, display=6, debounce=0.01)
+            assert await asyncio.gather(names.suggest('Yu'), names.suggest('Mi')) == [typed[1], ['Mirei', 'Mireille']]
+            return typed, stub.requests - 2
+    typed, requests = loop.run_until_complete(func())
+    assert typed[0] == [] and typed[1] == ['Yui', 'Yuii', 'Yuiko', 'Yuna', 'Yurei'] and requests == 2
+    index = NameIndex(['b', 'Ab', 'aa', 'AC'])
+    assert index.prefix('a') == ['aa', 'Ab', 'AC'] and index.prefix('a', 1) == ['aa'] and index.prefix('z') == []
+
+def test_item_index(tmpdir):
+    from BladeAndSoul.bns import search_item
+    from BladeAndSoul.items import ItemIndex, decode_jsonp
+    path = str(tmpdir.join('items.db'))
+
+    async def func(query, display=3):
+        async with stubbed(item_index=ItemIndex(path)) as (stub, client):
+            items = await search_item(query, display=display, client=client)
+            return [x['name'] for x in items], stub.requests, client.item_index
+    assert loop.run_until_complete(func('Moonstone'))[1] == 4
+    names, requests, index = loop.run_until_complete(func(' moonstone'))  # a new client, the index is on disk
+    assert names == ['Moonstone', 'Moonstone Crystal', 'Moonstone Vial'] and requests == 3
+    assert index.item('NA', 'moonstone crystal')[0] == 'Moonstone Crystal'
+    assert loop.run_until_complete(func('Moonstone', display=5))[1] == 4  # more names than were asked for before
+
+    for text in ('suggestKeyword({"a": [1]});', '\r\n/**/ cb ( {"a": [1]} ) ;\r\n', '{"a": [1]}', 'x.y({"a":[1]})'):
+        assert decode_jsonp(text) == {'a': [1]}
+    try:
+        decode_jsonp('<html>Bad Gateway</html>')
+    except ValueError:
+        pass
+    else:
+        assert False
+
+def test_watch():
+    from BladeAndSoul.cache import LRUCache
+    from BladeAndSoul.watch import Change, Watcher
+
+    async def func():
+        async with stubbed(cache=LRUCache()) as (stub, client):
+            watcher = Watcher(client, min_interval=0.01, max_interval=0.02)
+            watcher.watch(['Yui'])
+            assert await watcher.poll('Yui') is None  # the first snapshot
+            assert await watcher.poll('Yui') is None
+            page = stub.pages['/profile']
+            stub.pages['/profile'] = page.replace('Baleful Dagger - Stage 10', 'Baleful Dagger - Stage 11')
+            event = await watcher.poll('Yui')
+            assert event.changes == [Change('Gear', 'Weapon', 'Baleful Dagger - Stage 10', 'Baleful Dagger - Stage 11')]
+
+            stub.pages['/profile'] = page.replace('Tranquility', 'Serenity')
+            stream = watcher.changes()
+            event = await asyncio.wait_for(stream.__anext__(), 5)
+            await stream.aclose()
+            return event, watcher.watched['yui']
+    event, state = loop.run_until_complete(func())
+    assert set(event.changes) == {Change('Clan', None, 'Tranquility', 'Serenity'),
+                                  Change('Gear', 'Weapon', 'Baleful Dagger - Stage 11', 'Baleful Dagger - Stage 10')}
+    assert state.changed == 2 and state.polls >= 4
+
+def test_conditional():
+    from BladeAndSoul import metrics
+    from BladeAndSoul.bns import fetch_profile
+
+    async def func(etag):
+        async with stubbed(stub={'etag': etag}) as (stub, client):
+            first = await fetch_profile('Yui', client=client)
+            second = await fetch_profile('Yui', client=client)
+            stub.pages['/profile'] = stub.pages['/profile'].replace('Tranquility', 'Serenity')
+            third = await fetch_profile('Yui', client=client)
+            return first, second, third, stub.not_modified
+    recorder = metrics.use(metrics.Recorder())
+    try:
+        first, second, third, not_modified = loop.run_until_complete(func(True))
+    finally:
+        metrics.use(None)
+    assert second is first and third['Clan'] == 'Serenity'  # identical pages aren't parsed again
+    assert not_modified == 3 and recorder.total('fetch.not_modified') == 3 and recorder.total('parse.skipped') == 3
+    first, second, third, not_modified = loop.run_until_complete(func(False))
+    assert second is first and not_modified == 0
+
+def test_soulshields(tmpdir, monkeypatch):
+    import os
+    import yaml
+    from BladeAndSoul import bns, soulshields
+    from BladeAndSoul.data import SouShields
+    from benchmarks.stub import fixture
+    assert soulshields.compile(target=str(tmpdir.join('SS.json'))) == soulshields.load()  # SS.json matches SS.yml
+    # a checkout leaving SS.yml newer than SS.json doesn't recompile it
+    monkeypatch.setattr(soulshields, '_data', None)
+    monkeypatch.setattr(soulshields, 'compile', None)
+    os.utime(soulshields.SOURCE, (os.path.getmtime(soulshields.COMPILED) + 10,) * 2)
+    assert soulshields.load()['sets']
+    with open(soulshields.SOURCE) as f:
+        raw = yaml.safe_load(f)
+    assert SouShields.SS['Yuran']['1'] == '\n'.join(sorted('{}: {}'.format(k, v) for k, v in raw['Yuran']['1'].items()))
+    profile = bns.parse_profile(fixture('profile.html'), [])
+    found = soulshields.match(profile['SoulSheild'], profile['Set Bonus'])
+    assert found['sets'] == {'Yuran': 5} and found['set_stats'] == {'HP': 820, 'Defense': 248}
+    assert found['stats']['Critical'] == (451, 267, 184, 0)
+    assert ('Yuran', '3') not in found['pieces']['Critical'] and ('Yuran', '1') in found['pieces']['Critical']
+    assert soulshields.pieces_with('Critical Defense') == [('Elder', '1'), ('Elder', '2')]
+
+def test_render():
+    from BladeAndSoul import Character, bns, render
+    from benchmarks.stub import fixture
+    data = bns.parse_profile(fixture('profile.html'), ['Yuiko', 'Yuna'])
+    c = Character(data)
+    stats = c.pretty_stats()
+    assert stats.startswith('```ruby\nYui [') and 'Critical Hit: ' in stats and stats.endswith('```')
+    assert c.pretty_stats() is stats and render.card(c, 'stats') is stats  # kept until refreshed
+    c._load(dict(data, Level='50'))
+    assert c.pretty_stats() is not stats and ' Level 50' in c.pretty_stats()
+
+    characters = [Character(dict(data, **{'Character Name': 'Yui{}'.format(i)})) for i in range(100)]
+    pages = render.roster(characters, limit=500)
+    assert len(pages) > 1 and all(len(p) <= 500 and p.startswith('```\nName') and p.endswith('```') for p in pages)
+    assert sum(p.count('\nYui') for p in pages) == 100
+    pages = render.cards(characters, 'outfit')
+    assert all(len(p) <= render.LIMIT for p in pages) and sum(p.count("'s Outfit:") for p in pages) == 100
+    assert render.paginate(['aa', 'bb', 'cc'], limit=5) == ['aa\nbb', 'cc']
+
+def test_export(tmpdir, monkeypatch):
+    import json
+    import os
+    from BladeAndSoul import Client, export as export_module
+    from BladeAndSoul.export import export
+    output, checkpoint = str(tmpdir.join('out.jsonl')), str(tmpdir.join('out.ckpt'))
+
+    def names(lines, fail_after=None):
+        for i, line in enumerate(lines):
+            if i == fail_after:
+                raise IOError('interrupted')
+            yield line
+
+    async def func(lines, output=output, **kwargs):
+        async with stubbed() as (stub, client):
+            stub.missing.add('Nobody')
+            return await export(lines, output, client=client, concurrency=2, batch=1, **kwargs)
+    lines = ['Yui\n', '\n', 'Nobody\n', 'Yuna\n', 'Mirei\n']
+    try:
+        loop.run_until_complete(func(names(lines, fail_after=3), checkpoint=checkpoint))
+    except IOError:
+        pass
+    with open(output, 'a') as f:
+        f.write('{"written after the checkpoint": true}\n')
+    assert loop.run_until_complete(func(names(lines), checkpoint=checkpoint)) == 2  # Yuna and Mirei
+    with open(output) as f:
+        rows = [json.loads(line) for line in f]
+    assert sorted(row['query'] for row in rows) == ['Mirei', 'Nobody', 'Yui', 'Yuna']
+    assert [row['error'].split(':')[0] for row in rows if row['query'] == 'Nobody'] == ['CharacterNotFound']
+    assert {row['character']['Clan'] for row in rows if not row['error']} == {'Tranquility'}
+    assert loop.run_until_complete(func(names(lines), checkpoint=checkpoint)) == 0
+    with open(checkpoint) as f:
+        assert json.load(f) == {'done': 5, 'finished': [], 'position': os.path.getsize(output), 'fetched': 4}
+    output = str(tmpdir.join('items.jsonl'))
+    assert loop.run_until_complete(func(['Moonstone'], output, kind='items')) == 1
+    with open(output) as f:
+        items = json.loads(f.read())['items']
+    assert items[0]['name'] == 'Moonstone' and all(price > 0 for price, _ in items[0]['prices'])
+
+    # a slow first name doesn't let the export read more than 4 * concurrency lines ahead of it
+    started = []
+
+    async def get_character(name, **kwargs):
+        started.append(name)
+        if name == 'slow':
+            await asyncio.sleep(0.2)
+            return ValueError(len(started))  # the names started while it was fetched
+        return ValueError()
+    monkeypatch.setattr(export_module, 'get_character', get_character)
+    output = str(tmpdir.join('slow.jsonl'))
+    assert loop.run_until_complete(export_module.export(['slow'] + ['x'] * 100, output, concurrency=2,
+                                                        client=Client())) == 101
+    with open(output) as f:
+        assert {'query': 'slow', 'error': 'ValueError: 8'} in map(json.loads, f)
+
+def test_export_parquet(tmpdir):
+    import pytest
+    parquet = pytest.importorskip('pyarrow.parquet')
+    from BladeAndSoul import sync
+    from benchmarks.stub import StubServer
+    stub = StubServer()
+    sync.run(stub.__aenter__())
+    try:
+        stub.patch()
+        stub.missing.add('Nobody')
+        assert sync.export(['Yui', 'Nobody', 'Yuna'], str(tmpdir.join('characters')), format='parquet', batch=2) == 3
+        assert sync.export(['Moonstone'], str(tmpdir.join('items')), kind='items', format='parquet', display=3) == 1
+    finally:
+        sync.run(stub.__aexit__(None, None, None))
+    table = parquet.read_table(str(tmpdir.join('characters')))
+    assert len(tmpdir.join('characters').listdir()) == 2
+    assert sorted(zip(table.column('query').to_pylist(), table.column('Clan').to_pylist())) == \
+        [('Nobody', None), ('Yui', 'Tranquility'), ('Yuna', 'Tranquility')]
+    rows = parquet.read_table(str(tmpdir.join('items'))).to_pylist()
+    assert rows[0]['name'] == 'Moonstone' and len(rows[0]['prices']) == len(rows[0]['amounts']) > 0